@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+#
+# Compressed pack of old entries (jctl archive, jctl --archive).
+#
+
+import os
+
+class ArchivePack:
+    """
+    Compressed pack of (old) entries in the journal's cache directory, so
+    they can be read from one file, and scanned in one sequential read,
+    rather than opened one by one.
+
+    The pack is a header naming the codec (zlib or lzma), each entry's text
+    compressed separately, then an offset table and its position. Entries
+    are stored with the mtime & size their file had when packed, and are only
+    read from the pack while their file is unchanged.
+    """
+    MAGIC = b"jctl-pack 1 "
+    CODECS = ("zlib", "lzma")
+    TABLE_POS = ">Q"
+
+    def __init__(self, path):
+        self.path = path
+        self.codec = None
+        self.table = {} # entry name -> (offset, length, mtime_ns, size)
+        self.data = None
+
+    def load(self):
+        """Map the pack if there is one, starting empty if it's missing/bad."""
+        import importlib
+        import mmap
+        import pickle
+        import struct
+        try:
+            with open(self.path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        try:
+            header_end = data.find(b"\n")
+            codec = data[len(ArchivePack.MAGIC):header_end].decode("ascii")
+            if data[:len(ArchivePack.MAGIC)] != ArchivePack.MAGIC \
+                    or codec not in ArchivePack.CODECS:
+                raise ValueError("not a jctl pack")
+            pos_size = struct.calcsize(ArchivePack.TABLE_POS)
+            table_pos, = struct.unpack(ArchivePack.TABLE_POS, data[-pos_size:])
+            table = pickle.loads(data[table_pos:-pos_size])
+        except (ValueError, struct.error, EOFError, pickle.UnpicklingError):
+            data.close()
+            return
+        self.codec = importlib.import_module(codec)
+        self.table = table
+        self.data = data
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+
+    def is_fresh(self, entry, stat):
+        """Return whether an entry is packed as it is now ((mtime, size) stat)."""
+        record = self.table.get(entry)
+        return record is not None and stat is not None and record[2:] == tuple(stat)
+
+    def read(self, entry):
+        """Return the (uncompressed) bytes of a packed entry."""
+        offset, length, mtime, size = self.table[entry]
+        return self.codec.decompress(self.data[offset:offset+length])
+
+    def scan(self, entries, query, tokens=None):
+        """
+        Return the packed entries matching a Query, sorted oldest to newest.
+        Entries are read in pack order, so the pack is read sequentially.
+
+        Given ranking tokens, return a record for each entry instead, as
+        scan_files() does.
+        """
+        import mmap
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            self.data.madvise(mmap.MADV_SEQUENTIAL)
+        entries = sorted(entries, key=lambda entry: self.table[entry][0])
+        if tokens is None:
+            return sorted(entry for entry in entries
+                    if query.match_data(entry, self.read(entry)))
+        tokens = query.count_tokens(tokens)
+        records = []
+        for entry in entries:
+            data = self.read(entry)
+            matched, tfs = query.match_counts(entry, data, tokens)
+            records.append((entry, matched, len(data), tfs))
+        return sorted(records)
+
+    def build(self, stats, codec_name):
+        """
+        Write a new pack of the entries in stats (a dict of names to (path,
+        mtime, size)), reusing compressed data for entries that are already
+        packed unchanged. Return the number of entries (re)compressed.
+        """
+        import importlib
+        import pickle
+        import struct
+        codec = importlib.import_module(codec_name)
+        reuse = self.codec is codec
+        table = {}
+        compressed = 0
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(ArchivePack.MAGIC + codec_name.encode("ascii") + b"\n")
+            for entry in sorted(stats):
+                path, mtime, size = stats[entry]
+                if reuse and self.is_fresh(entry, (mtime, size)):
+                    offset, length = self.table[entry][:2]
+                    blob = self.data[offset:offset+length]
+                else:
+                    with open(path, "rb") as entry_file:
+                        blob = codec.compress(entry_file.read())
+                    compressed += 1
+                table[entry] = (f.tell(), len(blob), mtime, size)
+                f.write(blob)
+            table_pos = f.tell()
+            pickle.dump(table, f, pickle.HIGHEST_PROTOCOL)
+            f.write(struct.pack(ArchivePack.TABLE_POS, table_pos))
+        self.close()
+        os.replace(tmp_path, self.path)
+        self.load()
+        return compressed
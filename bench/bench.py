@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+#
+# Benchmark core jctl paths against synthetic journals.
+#
+# Generates deterministic Jekyll journals of the given sizes in temporary Git
+# repos, times each path cold (no jctl caches, fresh process state) and warm
+# (caches built, files recently read), and writes the results as JSON. Give a
+# previous results file with --baseline to check for regressions.
+#
+
+import sys
+import os
+import argparse
+import contextlib
+import json
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import journalctl
+
+WORDS = """alpha beta gamma delta coffee rain train exam meal walk river
+mountain letter friend market garden winter summer autumn spring morning
+evening music book film city village station library kitchen window""".split()
+
+# (body size in words, weight)
+BODY_SIZES = [(40, 60), (400, 30), (4000, 9), (40000, 1)]
+
+def generate_journal(path, size, seed=0, dirty=0.01):
+    """
+    Generate a journal of size entries in a new Git repo at path, with a
+    fraction (dirty) of entries modified after committing.
+
+    Return a list of all entry names.
+    """
+    rng = random.Random(seed)
+    entry_dir = os.path.join(path, "_posts")
+    os.makedirs(entry_dir)
+
+    names = []
+    seen = set()
+    day = 0
+    for i in range(size):
+        day += rng.choice([0, 0, 1, 1, 2])
+        date = time.strftime("%Y-%m-%d", time.gmtime(946684800 + day * 86400))
+        # entry names must match their date & title, so retry on collisions
+        name = None
+        while name is None or name in seen:
+            title = " ".join(rng.choice(WORDS).capitalize() for _ in range(4))
+            name = "{}-{}".format(date, journalctl.make_slug(title))
+        seen.add(name)
+        body_words = rng.choices(BODY_SIZES, weights=[w for s, w in BODY_SIZES])[0][0]
+        body = " ".join(rng.choice(WORDS) for _ in range(body_words))
+        with open(os.path.join(entry_dir, name + ".md"), "w") as f:
+            f.write("---\nlayout: post\ntitle: \"{}\"\ndate: {} 12:00:00 +0000\n"
+                    "tags: [{}]\n---\n{}\n".format(title, date, rng.choice(WORDS), body))
+        names.append(name)
+
+    git = ["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost"]
+    subprocess.check_call(git + ["init", "-q"], cwd=path)
+    subprocess.check_call(git + ["add", "-A"], cwd=path)
+    subprocess.check_call(git + ["commit", "-q", "-m", "synthetic journal"], cwd=path)
+
+    for name in rng.sample(names, int(size * dirty)):
+        with open(os.path.join(entry_dir, name + ".md"), "a") as f:
+            f.write("edited\n")
+    return names
+
+def make_jctl(path, *args):
+    """Return a JournalCtl for a journal, as if run with the given arguments."""
+    os.environ.setdefault("EDITOR", "true")
+    old_argv = sys.argv
+    sys.argv = ["jctl"] + list(args) + ["--base", path]
+    try:
+        return journalctl.JournalCtl()
+    finally:
+        sys.argv = old_argv
+
+def drop_caches():
+    """Drop the OS page cache (Linux, needs root). Return whether it worked."""
+    try:
+        subprocess.check_call(["sync"])
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+def get_paths(names, rng):
+    """Return the benchmarked paths as {name: function(journal_path)}."""
+    sample = rng.sample(names, min(100, len(names)))
+    keywords = rng.sample(WORDS, 2)
+
+    def front_matter(path):
+        j = make_jctl(path, "edit")
+        for entry in sample:
+            j.get_all_front_matter(entry)
+
+    def fix(path):
+        j = make_jctl(path, "edit")
+        for entry in sample[:10]:
+            date = j.get_front_matter(entry, "date")
+            j.fix_entry(entry, date=date)
+
+    def recent(path):
+        make_jctl(path, "recent", "-n", "20").cmd_recent()
+
+    return {
+        "find_entries": lambda path: make_jctl(path, "edit").find_entries(keywords),
+        "find_entries_fuzzy": lambda path: make_jctl(path, "edit").find_entries(
+            [keywords[0][:-1] + "x"]),
+        "search_entries": lambda path: make_jctl(path, "search").search_entries(keywords),
+        "search_entries_index": lambda path: make_jctl(path, "search",
+            "--index").search_entries(keywords),
+        "cmd_recent": recent,
+        "get_all_front_matter": front_matter,
+        "fix_entry": fix,
+        "get_git_status": lambda path: make_jctl(path, "status").get_git_status(),
+    }
+
+def time_call(func, *args):
+    """Time a call (in seconds), discarding anything it prints."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+def run(sizes, paths_wanted, repeat, seed, keep, can_drop_caches):
+    results = []
+    for size in sizes:
+        tmp_dir = tempfile.mkdtemp(prefix="jctl-bench-{}-".format(size))
+        journal = os.path.join(tmp_dir, "journal")
+        try:
+            print("generating {} entries...".format(size), file=sys.stderr)
+            names = generate_journal(journal, size, seed)
+            paths = get_paths(names, random.Random(seed))
+            for name, func in paths.items():
+                if paths_wanted and name not in paths_wanted:
+                    continue
+                # cold: no jctl caches (and no page cache, if we can drop it)
+                shutil.rmtree(os.path.join(journal, journalctl.JournalCtl.CACHE_DIR),
+                        ignore_errors=True)
+                dropped = can_drop_caches and drop_caches()
+                cold = time_call(func, journal)
+                warm = min(time_call(func, journal) for _ in range(repeat))
+                for mode, seconds in [("cold", cold), ("warm", warm)]:
+                    results.append({"size": size, "path": name, "mode": mode,
+                        "seconds": seconds,
+                        "page_cache_dropped": dropped if mode == "cold" else False})
+                print("{:>8} {:<22} cold {:9.4f}s  warm {:9.4f}s".format(
+                    size, name, cold, warm), file=sys.stderr)
+        finally:
+            if keep:
+                print("kept journal at '{}'".format(journal), file=sys.stderr)
+            else:
+                shutil.rmtree(tmp_dir)
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Print results that are more than threshold times slower than the
+    baseline. Return the number of regressions.
+    """
+    base = {(r["size"], r["path"], r["mode"]): r["seconds"] for r in baseline["results"]}
+    regressions = 0
+    for r in results:
+        key = (r["size"], r["path"], r["mode"])
+        if key not in base or base[key] <= 0:
+            continue
+        ratio = r["seconds"] / base[key]
+        if ratio > threshold:
+            regressions += 1
+            print("REGRESSION {} {} ({}): {:.4f}s vs {:.4f}s baseline ({:.2f}x)".format(
+                r["path"], r["size"], r["mode"], r["seconds"], base[key], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Benchmark core jctl paths on synthetic journals.")
+    parser.add_argument("-s", "--sizes", default="1000,10000",
+            help="comma-separated journal sizes (e.g. 1000,10000,100000,1000000)")
+    parser.add_argument("-p", "--paths",
+            help="comma-separated paths to benchmark (default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+            help="warm runs per path (the fastest is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write JSON results to this file")
+    parser.add_argument("-b", "--baseline", help="compare against a previous results file")
+    parser.add_argument("-t", "--threshold", type=float, default=1.25,
+            help="slowdown ratio vs baseline counted as a regression")
+    parser.add_argument("--drop-caches", action="store_true",
+            help="drop the OS page cache before cold runs (Linux, needs root)")
+    parser.add_argument("--keep", action="store_true",
+            help="keep the generated journals")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    paths_wanted = args.paths.split(",") if args.paths else None
+    results = run(sizes, paths_wanted, args.repeat, args.seed, args.keep,
+            args.drop_caches)
+
+    output = {
+        "meta": {
+            "time": time.strftime("%F %T %z"),
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+#
+# SQLite catalogue of entry metadata (jctl --catalogue).
+#
+
+import re
+
+class Catalogue:
+    """
+    SQLite catalogue of entry metadata (names, dates, titles, front matter),
+    kept in the journal's cache directory.
+
+    Rows are reconciled against the entry directory by mtime & size, so only
+    new or changed entries get parsed. Metadata lookups then become indexed
+    queries rather than directory scans plus front matter parses.
+    """
+    VERSION = 1
+    LIST_FIELDS = ["tags", "categories"]
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            name TEXT PRIMARY KEY,
+            date TEXT NOT NULL,
+            title TEXT,
+            mtime INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            hash TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+        CREATE TABLE IF NOT EXISTS fields (
+            name TEXT NOT NULL REFERENCES entries (name) ON DELETE CASCADE,
+            key TEXT NOT NULL,
+            value TEXT
+        );
+        CREATE INDEX IF NOT EXISTS fields_name ON fields (name);
+        CREATE INDEX IF NOT EXISTS fields_key_value ON fields (key, value);
+        CREATE TABLE IF NOT EXISTS tags (
+            name TEXT NOT NULL REFERENCES entries (name) ON DELETE CASCADE,
+            tag TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+        CREATE INDEX IF NOT EXISTS tags_name ON tags (name);
+    """
+
+    def __init__(self, path):
+        import sqlite3
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != Catalogue.VERSION:
+            self.db.executescript("""
+                DROP TABLE IF EXISTS tags;
+                DROP TABLE IF EXISTS fields;
+                DROP TABLE IF EXISTS entries;
+            """)
+            self.db.executescript(Catalogue.SCHEMA)
+            self.db.execute("PRAGMA user_version = {}".format(Catalogue.VERSION))
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def split_list(value):
+        """Split a front matter list value ('[a, b]' or 'a b') into items."""
+        value = value.strip()
+        if value.startswith("[") and value.endswith("]"):
+            items = value[1:-1].split(",")
+        else:
+            items = value.split()
+        return [item.strip().strip("\"'") for item in items if item.strip()]
+
+    def reconcile(self, stats, load):
+        """
+        Bring the catalogue in line with the given {entry: (mtime, size)} dict.
+
+        load(entry) is called for new/changed entries, and must return a tuple
+        (title, front_matter, content_hash) where front_matter is a list of
+        [var, value] pairs.
+
+        Return the number of entries (re-)catalogued.
+        """
+        known = {name: (mtime, size) for name, mtime, size
+                in self.db.execute("SELECT name, mtime, size FROM entries")}
+        changes = {name: None for name in known if name not in stats}
+        changes.update((entry, stat) for entry, stat in stats.items()
+                if known.get(entry) != stat)
+        self.apply_changes(changes, load)
+        return len(changes) - sum(1 for stat in changes.values() if stat is None)
+
+    def apply_changes(self, changes, load):
+        """
+        Update the catalogue for only the given {entry: (mtime, size)}
+        changes, where a stat of None means the entry was removed.
+        """
+        with self.db:
+            for entry, stat in changes.items():
+                self.db.execute("DELETE FROM entries WHERE name = ?", (entry,))
+                if stat is None:
+                    continue
+                title, front_matter, content_hash = load(entry)
+                mtime, size = stat
+                self.db.execute("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                        (entry, entry[:10], title, mtime, size, content_hash))
+                self.db.executemany("INSERT INTO fields VALUES (?, ?, ?)",
+                        [(entry, var, value) for var, value in front_matter])
+                for var, value in front_matter:
+                    if var in Catalogue.LIST_FIELDS and value:
+                        self.db.executemany("INSERT INTO tags VALUES (?, ?)",
+                                [(entry, tag) for tag in Catalogue.split_list(value)])
+
+    def names(self, since=None, until=None):
+        """Return all entry names in a date range, oldest to newest."""
+        return [row[0] for row in self.__query("name", since, until)]
+
+    def names_between(self, low, high):
+        """Return the entry names from low up to (not including) high, sorted."""
+        return [row[0] for row in self.db.execute(
+            "SELECT name FROM entries WHERE name >= ? AND name < ? ORDER BY name",
+            (low, high))]
+
+    def titles(self, since=None, until=None, tag=None):
+        """Return (name, title) pairs in a date range, oldest to newest."""
+        return self.__query("name, title", since, until, tag=tag).fetchall()
+
+    def recent(self, count, since=None, until=None):
+        """Return the newest count entry names in a date range, oldest first."""
+        rows = self.__query("name", since, until, newest_first=True, limit=count)
+        return [row[0] for row in reversed(rows.fetchall())]
+
+    def title(self, entry):
+        row = self.db.execute("SELECT title FROM entries WHERE name = ?",
+                (entry,)).fetchone()
+        return row[0] if row else None
+
+    def match_names(self, keywords):
+        """Return entry names containing every keyword, oldest to newest."""
+        where = " AND ".join(["name LIKE ? ESCAPE '\\'"] * len(keywords))
+        params = ["%" + re.sub(r"([\\%_])", r"\\\1", word) + "%" for word in keywords]
+        query = "SELECT name FROM entries"
+        if keywords:
+            query += " WHERE " + where
+        return [row[0] for row in self.db.execute(query + " ORDER BY name", params)]
+
+    def __query(self, columns, since, until, tag=None, newest_first=False, limit=None):
+        query = "SELECT {} FROM entries".format(columns)
+        conditions = []
+        params = []
+        if since:
+            conditions.append("date >= ?")
+            params.append(since)
+        if until:
+            # partial dates (e.g. '2014-03') include the whole period
+            conditions.append("substr(date, 1, ?) <= ?")
+            params += [len(until), until]
+        if tag:
+            conditions.append("name IN (SELECT name FROM tags WHERE tag = ?)")
+            params.append(tag)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY name" + (" DESC" if newest_first else "")
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self.db.execute(query, params)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+#
+# Base class for jctl commands.
+#
+# Commands live in the commands/ package and are listed in
+# JournalCtl.COMMANDS, so only the command being run is ever imported.
+#
+
+import sys
+
+class Command:
+    def __init__(self, jctl, cmd_name, short_alias=None, min_args=0):
+        self.jctl = jctl
+        self.cmd_name = cmd_name
+        self.short_alias = short_alias
+
+        if isinstance(min_args, int):
+            self.min_args = min_args
+        else:
+            self.error("min_args is not an integer", jctl.ERR_NOT_VALID)
+
+    # Logging {{{
+    def log(self, message):
+        """If verbose, log an event."""
+        self.jctl.log("{}: {}".format(self.cmd_name, message))
+
+    def error(self, message, exit_code=1):
+        """Log an error and exit."""
+        self.jctl.error("{}: {}".format(self.cmd_name, message), exit_code)
+    # Logging }}}
+
+    def exec(self, arguments):
+        no_of_args = len(arguments)
+        if no_of_args < self.min_args:
+            self.error("expected at least {} arguments (got {})".format(
+                self.min_args, no_of_args), self.jctl.ERR_WRONG_ARGS)
+
+        # checks were successful, execute command
+        self.exec_main(arguments)
+
+    def exec_main(self, arguments):
+        raise NotImplementedError
+
+    def print_help(self):
+        print("No help for command '{}'".format(self.cmd_name))
+
+if __name__ == "__main__":
+    print("NOTE: this module is *not* meant to be run (it's a base class for jctl commands)")
+    sys.exit(1)
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+#
+# jctl archive: pack old entries into a compressed archive for fast reads.
+#
+
+from command import Command
+
+class CmdArchive(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "archive",
+                min_args=0)
+
+    def print_help(self):
+        print("usage: jctl archive [clear]")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_archive(arguments)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl commit: commit a dirty/untracked entry.
+#
+
+from command import Command
+
+class CmdCommit(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "commit",
+                short_alias="c",
+                min_args=0)
+
+    def print_help(self):
+        print("usage: jctl commit [-m TITLE] [-e] [--since DATE] [--until DATE] [KEYWORDS | DATE-GLOB]... (e.g. 2014-*)")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_commit(arguments)
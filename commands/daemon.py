@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl daemon: run (or stop) a resident jctl server.
+#
+
+from command import Command
+
+class CmdDaemon(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "daemon",
+                short_alias=None,
+                min_args=0)
+
+    def print_help(self):
+        print("usage: jctl daemon [stop]")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_daemon(arguments)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl edit: open an entry, found by name keywords, in $EDITOR.
+#
+
+from command import Command
+
+class CmdEdit(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "edit",
+                short_alias="e",
+                min_args=1)
+
+    def print_help(self):
+        print("usage: jctl edit [--since DATE] [--until DATE] (KEYWORDS | DATE-GLOB)... (e.g. 2014-*)")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_edit(arguments)
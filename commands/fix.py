@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+#
+# jctl fix: check entries are named after their date & title, renaming them.
+#
+
+from command import Command
+
+class CmdFix(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "fix",
+                min_args=0)
+
+    def print_help(self):
+        print("usage: jctl fix [--dry-run] (--all | KEYWORD...)")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_fix(arguments)
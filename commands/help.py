@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl help: list commands, or show help for one.
+#
+
+from command import Command
+
+class CmdHelp(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "help",
+                short_alias="h",
+                min_args=0)
+
+    def print_help(self):
+        print("usage: jctl help [COMMAND]")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_help(arguments)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl list: list entries with their titles.
+#
+
+from command import Command
+
+class CmdList(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "list",
+                short_alias="l",
+                min_args=0)
+
+    def print_help(self):
+        print("usage: jctl list [--tag TAG] [--since DATE] [--until DATE]")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_list()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl new: create a new entry using a template.
+#
+
+from command import Command
+
+class CmdNew(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "new",
+                short_alias="n",
+                min_args=2)
+
+    def print_help(self):
+        print("usage: jctl new TEMPLATE TITLE [TEMPLATE ARGS]...")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_new(arguments)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl push: push the journal repo.
+#
+
+from command import Command
+
+class CmdPush(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "push",
+                short_alias="p",
+                min_args=0)
+
+    def print_help(self):
+        print("usage: jctl push")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_push()
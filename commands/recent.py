@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl recent: show the titles of the most recent entries.
+#
+
+from command import Command
+
+class CmdRecent(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "recent",
+                short_alias="r",
+                min_args=0)
+
+    def print_help(self):
+        print("usage: jctl recent [-n COUNT] [--since DATE] [--until DATE]")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_recent()
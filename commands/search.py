@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl search: search the full text of entries.
+#
+
+from command import Command
+
+class CmdSearch(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "search",
+                short_alias="s",
+                min_args=1)
+
+    def print_help(self):
+        print("usage: jctl search [--rank] [--limit K] [--since DATE] [--until DATE] QUERY... [DATE-GLOB]... (e.g. 2014-*)")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_search(arguments)
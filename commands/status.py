@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# jctl status: show dirty/untracked files in the journal repo.
+#
+
+from command import Command
+
+class CmdStatus(Command):
+    def __init__(self, jctl):
+        Command.__init__(self, jctl, "status",
+                short_alias="st",
+                min_args=0)
+
+    def print_help(self):
+        print("usage: jctl status")
+
+    def exec_main(self, arguments):
+        self.jctl.cmd_status()
@@ -0,0 +1,2674 @@
+#!/usr/bin/env python3
+#
+# jctl: control program for a journal kept in Jekyll.
+#
+# Bigger parts only some commands need (indexes, the catalogue, search
+# queries...) are in their own modules, imported when they're used.
+#
+
+import sys
+import argparse
+import os
+import re
+import time
+import functools
+
+FILENAME = os.path.basename(sys.argv[0])
+
+class ArgumentParserUsage(argparse.ArgumentParser):
+    """
+    Argparse override to print usage to stderr on argument error, and to
+    allow options after the command.
+    """
+    def error(self, message):
+        sys.stderr.write("error: %s\n" % message)
+        self.print_help(sys.stderr)
+        sys.exit(2)
+
+    def parse_command_args(self, args=None):
+        """
+        Parse '[options] command [arguments]', where options may also be
+        mixed in with the arguments. After the command, only an option given
+        exactly (e.g. '--rank', '--limit=5' or '-m TITLE', but not an
+        abbreviation or a group like '-rv') is taken as one; anything else is
+        an argument, even if it starts with '-' (e.g. a negated search term,
+        '-ocean'), as is everything after '--'.
+        """
+        args = iter(sys.argv[1:] if args is None else args)
+        options, arguments = [], []
+        for arg in args:
+            if arg == "--":
+                arguments += args
+                break
+            if arguments:
+                takes_value = self.__exact_option_value(arg)
+            else:
+                takes_value = self.__option_value(arg)
+            if arguments and takes_value is None:
+                # not one of ours, so it's the command/an argument
+                arguments.append(arg)
+            elif arg.startswith("-") and len(arg) > 1:
+                # unknown options before the command are left to argparse
+                options.append(arg)
+                if takes_value:
+                    options += [next(args, "")]
+            else:
+                arguments.append(arg)
+        return self.parse_args(options + ["--"] + arguments)
+
+    def __exact_option_value(self, arg):
+        """
+        Return whether an option argument given exactly as one of our
+        options (or as '--option=value') is followed by a separate value, or
+        None if it isn't one.
+        """
+        actions = self._option_string_actions
+        if arg in actions:
+            return actions[arg].nargs != 0
+        name, sep, value = arg.partition("=")
+        if sep and name.startswith("--") and name in actions:
+            return False
+        return None
+
+    def __option_value(self, arg):
+        """
+        Return whether an option argument is followed by a separate value,
+        or None if it isn't one of our options. Long options can be
+        abbreviated, and short options grouped (e.g. '-rv'), the last maybe
+        with a number (e.g. '-k5').
+        """
+        takes_value = self.__exact_option_value(arg)
+        if takes_value is not None:
+            return takes_value
+        actions = self._option_string_actions
+        if arg.startswith("--"):
+            name, sep, value = arg.partition("=")
+            # long options can be abbreviated, as long as it's unambiguous
+            names = [option for option in actions
+                    if option.startswith("--") and option.startswith(name)]
+            if len(names) != 1:
+                return None
+            return False if sep else actions[names[0]].nargs != 0
+        if not arg.startswith("-"):
+            return None
+        for i in range(1, len(arg)):
+            action = actions.get("-" + arg[i])
+            if action is None:
+                return None
+            if action.nargs != 0:
+                rest = arg[i+1:]
+                return None if rest and not rest.isdigit() else not rest
+        return False if len(arg) > 1 else None
+
+SLUG_DROP_RE = re.compile(r"['\u2018\u2019]")
+SLUG_SEP_RE = re.compile(r"[^a-z0-9]+")
+
+@functools.lru_cache(maxsize=4096)
+def make_slug(text):
+    """
+    Return the slug of a string, matching the output of `ezstring`.
+
+    Accents are stripped (e.g. 'é' -> 'e'), apostrophes removed, the string
+    lowercased and any other run of non-alphanumeric characters replaced by a
+    single hyphen. Leading & trailing hyphens are stripped.
+    """
+    import unicodedata
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = SLUG_DROP_RE.sub("", text.lower())
+    return SLUG_SEP_RE.sub("-", text).strip("-")
+
+def strip_quotes(value):
+    """Return a front matter value without any quotes around it."""
+    if (value.startswith("\"") and value.endswith("\"")) \
+            or (value.startswith("'") and value.endswith("'")):
+        return value[1:-1]
+    return value
+
+ENTRY_DATE_RE = re.compile(r"\d{4}-\d\d-\d\d(?!\d)")
+
+def entry_date(value):
+    """
+    Return the YYYY-MM-DD date that a front matter date starts with (e.g.
+    '2014-03-05 10:00:00' or '"2014-03-05T10:00:00+00:00"'), or None if it
+    doesn't start with one.
+    """
+    match = ENTRY_DATE_RE.match(strip_quotes(value.strip()))
+    return match.group(0) if match else None
+
+FICLONE = 0x40049409 # Linux ioctl to reflink a file (copy-on-write clone)
+
+def copy_data(fsrc, fdst, offset=0):
+    """
+    Copy the contents of binary file fsrc from offset to its end into fdst (at
+    its current position), in the kernel with copy_file_range() or
+    sendfile() where possible.
+    """
+    import shutil
+    in_fd = fsrc.fileno()
+    out_fd = fdst.fileno()
+    fdst.flush()
+    start = fdst.tell()
+    for copy in ("copy_file_range", "sendfile"):
+        if not hasattr(os, copy):
+            continue
+        pos = offset
+        try:
+            while True:
+                if copy == "copy_file_range":
+                    copied = os.copy_file_range(in_fd, out_fd, 1 << 30, pos)
+                else:
+                    copied = os.sendfile(out_fd, in_fd, pos, 1 << 30)
+                if not copied:
+                    break
+                pos += copied
+            fdst.seek(0, os.SEEK_END)
+            return
+        except OSError:
+            # e.g. not supported between these files: start again
+            os.lseek(out_fd, start, os.SEEK_SET)
+            os.ftruncate(out_fd, start)
+    fsrc.seek(offset)
+    shutil.copyfileobj(fsrc, fdst)
+
+def copy_file(src, dst):
+    """
+    Copy a file's contents, as a reflink where the filesystem supports it (so
+    no data is copied), or else using copy_data().
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            import fcntl
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return
+        except (ImportError, OSError):
+            pass
+        copy_data(fsrc, fdst)
+
+def hash_file(path):
+    """Return the SHA-1 hex digest of a file's contents."""
+    import hashlib
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stat_fingerprint(path):
+    """
+    Return a tuple that changes whenever a file is written or replaced (or
+    None if it doesn't exist).
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+class Entry:
+    """
+    A journal entry file, split into front matter and body.
+
+    Only the front matter is read up front: it's streamed line by line up to
+    the closing separator, and the byte offset of the body is recorded so the
+    body can be read later by seeking straight to it.
+
+    JournalCtl.get_entry() caches these per entry name, so lookups of the
+    title, front matter and body all share a single read of the file.
+    """
+    __slots__ = ("name", "path", "raw_header", "body_offset", "body_text",
+            "front_matter")
+
+    ENCODING = "utf-8"
+
+    def __init__(self, name, path, raw_header, body_offset, body_text=None):
+        self.name = name
+        self.path = path
+        self.raw_header = raw_header
+        self.body_offset = body_offset
+        self.body_text = body_text
+        # parsed lazily by JournalCtl.get_all_front_matter()
+        self.front_matter = None
+
+    @classmethod
+    def read(cls, name, path, max_bytes):
+        """
+        Read only the front matter of an entry file, giving up (ValueError)
+        if the closing separator isn't found in the first max_bytes bytes.
+        """
+        sep = (JournalCtl.FRONT_MATTER_SEP + "\n").encode(Entry.ENCODING)
+        lines = []
+        size = 0
+        with open(path, "rb") as f:
+            for line in f:
+                lines.append(line)
+                size += len(line)
+                if line == sep and len(lines) > 1:
+                    break
+                if size > max_bytes:
+                    raise ValueError("no end of front matter in first {} bytes".format(max_bytes))
+            else:
+                raise ValueError("no end of front matter found")
+        return cls(name, path, b"".join(lines).decode(Entry.ENCODING), size)
+
+    @classmethod
+    def from_text(cls, name, path, text):
+        """Create an Entry from the full text of its file (e.g. just written)."""
+        end = text.find(JournalCtl.FRONT_MATTER_END) + len(JournalCtl.FRONT_MATTER_END)
+        raw_header = text[:end]
+        return cls(name, path, raw_header,
+                len(raw_header.encode(Entry.ENCODING)), text[end:])
+
+    def header(self):
+        """Return the raw front matter text (without separators)."""
+        begin_index = len(JournalCtl.FRONT_MATTER_SEP) + 1
+        return self.raw_header[begin_index:-len(JournalCtl.FRONT_MATTER_END)]
+
+    def body(self):
+        """Return the entry text following the front matter."""
+        if self.body_text is None:
+            with open(self.path, "rb") as f:
+                f.seek(self.body_offset)
+                self.body_text = f.read().decode(Entry.ENCODING)
+        return self.body_text
+
+    def text(self):
+        """Return the full text of the entry file."""
+        return self.raw_header + self.body()
+
+class Untimed:
+    """Stand-in for a Timings.Phase when not timing (see JournalCtl.timed())."""
+    __slots__ = ("nbytes",)
+
+    def __init__(self):
+        self.nbytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+def check_files(files, max_bytes):
+    """
+    Read the front matter of entries to check their names, returning
+    (results, nbytes): a list of (entry, date, title, problem) in the order
+    given, and the number of bytes read. files is a list of (entry, filename)
+    pairs.
+
+    date is the YYYY-MM-DD the entry's date starts with. date & title are
+    None (and problem says why) if the front matter can't be used to name
+    the entry.
+    """
+    results = []
+    nbytes = 0
+    for entry, filename in files:
+        try:
+            cached = Entry.read(entry, filename, max_bytes)
+            nbytes += cached.body_offset
+            header = cached.header()
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            results.append((entry, None, None, str(e)))
+            continue
+        fields = {}
+        problem = None
+        for line in header.strip().split("\n"):
+            parts = line.split(JournalCtl.FRONT_MATTER_VALUE_SEP, 1)
+            if len(parts) == 2:
+                fields[parts[0]] = parts[1]
+            elif parts[0] != "":
+                problem = "front matter variable '{}' has no value".format(parts[0].rstrip(":"))
+        if problem is None and not fields.get("title"):
+            problem = "no title found in front matter"
+        if problem is None and not fields.get("date"):
+            problem = "no date found in front matter"
+        if problem is None and entry_date(fields["date"]) is None:
+            problem = "front matter date '{}' doesn't start with YYYY-MM-DD".format(
+                    fields["date"])
+        if problem is not None:
+            results.append((entry, None, None, problem))
+        else:
+            results.append((entry, entry_date(fields["date"]),
+                strip_quotes(fields["title"]), None))
+    return results, nbytes
+
+def run_timed(func, *args):
+    """
+    Call func(*args), which returns (result, nbytes), and return (result,
+    nbytes, seconds) so a worker process can report how long it took.
+    """
+    start = time.perf_counter()
+    result, nbytes = func(*args)
+    return result, nbytes, time.perf_counter() - start
+
+def iter_tree(path, prune=None, subdir=""):
+    """
+    Yield a DirEntry for every file under a directory, recursing into
+    subdirectories. Hidden files & directories are skipped.
+
+    prune(subdir) may return True to skip a subdirectory (given relative to
+    path, e.g. '2014/03') without listing it.
+    """
+    with os.scandir(os.path.join(path, subdir)) as it:
+        for dirent in it:
+            if dirent.name.startswith("."):
+                continue
+            if dirent.is_dir():
+                child = os.path.join(subdir, dirent.name)
+                if prune is None or not prune(child):
+                    yield from iter_tree(path, prune, child)
+            else:
+                yield dirent
+
+class JournalCtl:
+    SUCCESS = 0
+    ERR_NONE_FOUND = 1
+    ERR_TEMPLATE_FAIL = 2
+    ERR_SELECT_CANCEL = 3
+    ERR_FILE_EXISTS = 4
+    ERR_NO_SUCH_CMD = 5
+    ERR_WRONG_ARGS = 6
+    ERR_BAD_FRONT_MATTER = 7
+    ERR_NOT_VALID = 8
+    ERR_GIT = 9
+    ERR_NO_FILE = 10
+
+    READ_ONLY = "r"
+    WRITE_ONLY = "w"
+
+    TEMPLATER_CMD = "pyplater.py"
+    TEMPLATE_PREFIX = "jctl-"
+    SLUG_CMD = "ezstring"
+
+    FRONT_MATTER_SEP = "---"
+    FRONT_MATTER_VALUE_SEP = ": "
+    FRONT_MATTER_END = "\n" + FRONT_MATTER_SEP + "\n"
+
+    CACHE_DIR = ".jctl"
+    SEARCH_INDEX_FILE = "search.db"
+    SLUG_CACHE_FILE = "slugs.cache"
+    CATALOGUE_FILE = "catalogue.db"
+    NAME_INDEX_FILE = "names.db"
+    DAEMON_SOCKET_FILE = "daemon.sock"
+    ARCHIVE_FILE = "archive.pack"
+
+    TIMINGS_ENV = "JCTL_TIMINGS" # set (not to 0) to show timings, or to 'json' for JSON
+
+    # Command manifest. Each command is only imported when it's run.
+    #   (name, short alias, "module:Class", arguments to insert)
+    COMMANDS = [
+        ("new", "n", "commands.new:CmdNew", []),
+        ("ne", None, "commands.new:CmdNew", ["entry"]),
+        ("nm", None, "commands.new:CmdNew", ["meal"]),
+        ("edit", "e", "commands.edit:CmdEdit", []),
+        ("search", "s", "commands.search:CmdSearch", []),
+        ("commit", "c", "commands.commit:CmdCommit", []),
+        ("push", "p", "commands.push:CmdPush", []),
+        ("recent", "r", "commands.recent:CmdRecent", []),
+        ("list", "l", "commands.list:CmdList", []),
+        ("status", "st", "commands.status:CmdStatus", []),
+        ("fix", None, "commands.fix:CmdFix", []),
+        ("archive", None, "commands.archive:CmdArchive", []),
+        ("daemon", None, "commands.daemon:CmdDaemon", []),
+        ("help", "h", "commands.help:CmdHelp", []),
+    ]
+
+    # arguments starting with a date and containing these are globs over
+    # entry names (e.g. '2014-*')
+    SCOPE_GLOB_RE = re.compile(r"[*?\[]")
+    DATE_PREFIX_RE = re.compile(r"\d{4}(-\d\d(-\d\d)?)?")
+
+    GIT_UNTRACKED = "??"
+    GIT_MODIFIED = "M"
+    GIT_DELETED = "D"
+    GIT_NULL_SHA = "0" * 40
+
+    # statuses commit --all handles, and the change each is committed as: it
+    # commits an entry as it is in the working tree, whatever is staged
+    GIT_COMMIT_ALL_CHANGES = {
+        GIT_UNTRACKED: GIT_UNTRACKED,
+        "A": GIT_UNTRACKED,
+        "AM": GIT_UNTRACKED,
+        GIT_MODIFIED: GIT_MODIFIED,
+        "MM": GIT_MODIFIED,
+        GIT_DELETED: GIT_DELETED,
+        "MD": GIT_DELETED,
+    }
+
+    def __init__(self):
+        # set variables
+        self.journal_dir = os.environ["HOME"] + "/proj/writing/journal"
+        self.entry_dir = "_posts"
+        self.editor = os.environ["EDITOR"]
+        self.entry_ext = ".md" # if this has >1 full stop then you gotta fix get_entries()
+        self.entry_layout = "" # subdirectories to keep entries in by date, e.g. "%Y/%m" ("" for none)
+        self.recent_num = 5
+        self.commit_msg_new = "new entry"
+        self.commit_msg_mod = "edited entry"
+        self.commit_msg_del = "deleted entry"
+        self.commit_msg_batch = "{} entries"
+        self.commit_extra = "\n\nCommit message auto-generated by jctl"
+        self.slug_cmd = None # set to JournalCtl.SLUG_CMD to use ezstring instead of make_slug()
+        self.slug_cache_persist = True # keep external slug results between runs
+        self.__slug_cache = None
+        self.__entries = {}
+        self.__entry_paths = None # entry names to files, when listed
+        self.search_limit = 10 # results shown when ranking search matches
+        self.use_search_index = False # keep a full text index for search (a scan is usually as fast)
+        self.__search_index = None
+        self.__name_index = None
+        self.fuzzy_threshold = 0.5 # minimum similarity for fuzzy entry name matches
+        self.fuzzy_limit = 10
+        self.front_matter_max = 64 * 1024 # bytes to read looking for end of front matter
+        self.use_catalogue = False # keep entry metadata in an SQLite catalogue
+        self.scan_jobs = 1 # workers for full text scans (0 for one per CPU)
+        self.scan_chunks_per_job = 4
+        self.__catalogue = None
+        self.use_daemon = False # forward lookups to a resident jctl server
+        self.daemon_idle_timeout = 60 * 60 # seconds before an idle server exits
+        self.daemon_start_timeout = 2.0
+        self.serving = False
+        self.git_untracked_cache = True # let git cache untracked directory listings
+        self.git_fsmonitor = False # use git's builtin fsmonitor (where supported)
+        self.__watcher = None
+        self.timings = None # per-phase Timings, if timing this run
+        self.use_archive = False # read old entries from a compressed pack ('jctl archive')
+        self.archive_age = 365 # days old an entry has to be to be archived
+        self.archive_codec = "zlib" # or "lzma" (smaller, but slower to read)
+        self.__archive = None
+
+        self.__parse_args()
+
+        # ensure that required directories exist
+        if not os.path.exists(self.journal_dir):
+            self.error("journal directory '{}' does not exist".format(
+                    self.journal_dir),
+                JournalCtl.ERR_NO_FILE)
+        if not os.path.exists("{}/{}".format(self.journal_dir, self.entry_dir)):
+            self.error("entry directory '{}' does not exist in journal directory".format(
+                    self.entry_dir),
+                JournalCtl.ERR_NO_FILE)
+
+    def exit(self, exit_code=0):
+        """Deinitialise and exit."""
+        sys.exit(exit_code)
+
+    # Logging {{{
+    def __log_message(self, message, pipe=sys.stdout):
+        """Log a message to a specific pipe (defaulting to stdout)."""
+        print(FILENAME + ": " + message, file=pipe)
+
+    def log(self, message):
+        """If verbose, log an event."""
+        if not self.args.verbose:
+            return
+        self.__log_message(message)
+
+    def error(self, message, exit_code=1):
+        """Log an error and exit."""
+        self.__log_message("error: " + message, sys.stderr)
+        self.exit(exit_code)
+
+    def usage(self, exit_code):
+        """Print usage and exit depending on given exit code."""
+        if exit_code == 0:
+            pipe = sys.stdout
+        else:
+            # if argument was non-zero, print to STDERR instead
+            pipe = sys.stderr
+
+        self.parser.print_help(pipe)
+        self.exit(exit_code)
+
+    def message(self, message):
+        """Print a message to stdout, regardless of verbosity."""
+        print(message)
+    # Logging }}}
+
+    def __parse_args(self):
+        self.parser = ArgumentParserUsage(
+                description="Control program for a journal kept in Jekyll.")
+
+        # add arguments
+        self.parser.add_argument("command", help="command to run")
+        self.parser.add_argument("arguments", nargs="*", help="argument(s) for command")
+        self.parser.add_argument("-m", "--msg", help="commit message for entry name (left of colon)")
+        self.parser.add_argument("-e", "--edit",
+                help="commit: bring up Git commit edit dialogue",
+                action="store_true")
+        self.parser.add_argument("-a", "--all",
+                help="commit: commit all dirty entries (matching any keywords) at once; fix: check every entry",
+                action="store_true")
+        self.parser.add_argument("--each",
+                help="commit: with --all, make one commit per entry",
+                action="store_true")
+        self.parser.add_argument("-v", "--verbose", help="be verbose",
+                action="store_true")
+        self.parser.add_argument("-b", "--base",
+                help="base Jekyll directory to use (parent of _posts)")
+        self.parser.add_argument("-t", "--tag",
+                help="list: only list entries with this tag/category")
+        self.parser.add_argument("--catalogue",
+                help="use the entry metadata catalogue",
+                action="store_true")
+        self.parser.add_argument("-n", "--count", type=int,
+                help="recent: number of entries to show")
+        self.parser.add_argument("--since", metavar="DATE",
+                help="only use entries dated on/after DATE (YYYY[-MM[-DD]])")
+        self.parser.add_argument("--until", metavar="DATE",
+                help="only use entries dated on/before DATE (YYYY[-MM[-DD]])")
+        self.parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                help="search: scan entries using N workers (0 for one per CPU)")
+        self.parser.add_argument("--threads",
+                help="search: scan using threads instead of processes (for cold, I/O-bound reads)",
+                action="store_true")
+        self.parser.add_argument("-r", "--rank",
+                help="search: rank matches by relevance (BM25, from the "
+                "search index with --index, else by reading the matches)",
+                action="store_true")
+        self.parser.add_argument("-k", "--limit", type=int, metavar="K",
+                help="search: show only the K best matches (implies --rank)")
+        self.parser.add_argument("--scores",
+                help="search: show relevance scores (implies --rank)",
+                action="store_true")
+        self.parser.add_argument("--archive",
+                help="read old entries from the compressed archive (built by 'jctl archive')",
+                action="store_true")
+        self.parser.add_argument("-d", "--daemon",
+                help="use (and if needed start) a resident jctl server for lookups",
+                action="store_true")
+        self.parser.add_argument("--history",
+                help="search: search every past revision of entries in Git history",
+                action="store_true")
+        self.parser.add_argument("--dry-run",
+                help="fix: only report what would be fixed",
+                action="store_true")
+        self.parser.add_argument("--index",
+                help="search: use the full text search index",
+                action="store_true")
+        self.parser.add_argument("--no-index",
+                help="don't use (or update) the search & entry name indexes",
+                action="store_true")
+        self.parser.add_argument("--timings",
+                help="on exit, print time spent per phase (shell commands, reads, command) to stderr",
+                action="store_true")
+        self.parser.add_argument("--timings-json",
+                help="like --timings, but print JSON",
+                action="store_true")
+
+        # remember configured settings that options can override, so they can
+        # be re-applied for each request a server handles
+        self.__settings = {
+            "use_catalogue": self.use_catalogue,
+            "use_daemon": self.use_daemon,
+            "use_archive": self.use_archive,
+            "use_search_index": self.use_search_index,
+            "scan_jobs": self.scan_jobs,
+            "search_limit": self.search_limit,
+            "recent_num": self.recent_num,
+        }
+
+        # parse & grab arguments
+        self.__apply_args(self.parser.parse_command_args())
+
+        if self.args.base:
+            self.journal_dir = self.args.base
+
+        timings_env = os.environ.get(JournalCtl.TIMINGS_ENV, "")
+        if timings_env == "0":
+            timings_env = ""
+        if self.args.timings or self.args.timings_json or timings_env:
+            from timings import Timings
+            self.timings = Timings(self.args.timings_json or timings_env == "json")
+
+    def __apply_args(self, args):
+        """Set options from parsed arguments, on top of configured settings."""
+        for setting, value in self.__settings.items():
+            setattr(self, setting, value)
+
+        self.args = args
+        self.arguments = self.args.arguments
+        self.command = self.args.command
+        self.commit_msg = self.args.msg
+        self.edit_commit = self.args.edit
+        self.use_index = not self.args.no_index
+        self.since = self.args.since
+        self.until = self.args.until
+
+        if self.args.catalogue:
+            self.use_catalogue = True
+        if self.args.daemon:
+            self.use_daemon = True
+        if self.args.archive:
+            self.use_archive = True
+        if self.args.index:
+            self.use_search_index = True
+        if self.args.jobs is not None:
+            self.scan_jobs = self.args.jobs
+        self.rank = self.args.rank or self.args.scores or self.args.limit is not None
+        if self.args.limit is not None:
+            self.search_limit = self.args.limit
+        if self.args.count is not None:
+            self.recent_num = self.args.count
+
+    def get_shell(self, args, input=None, env=None):
+        """
+        Run a shell command, returning the output.
+
+        input (bytes) is given to the command on stdin, and env is a dict of
+        extra environment variables to run it with.
+        """
+        import subprocess
+        was_successful = False
+
+        if env is not None:
+            env = dict(os.environ, **env)
+
+        # we run without a shell (default) so we don't need to shell escape
+        # strange titles e.g. ones with punctuation in
+        # also run in self.journal_dir
+        with self.timed("shell " + os.path.basename(args[0])) as phase:
+            proc = subprocess.Popen(args, stdout=subprocess.PIPE,
+                    stdin=subprocess.PIPE if input is not None else None,
+                    cwd=self.journal_dir, env=env)
+            out, err = proc.communicate(input)
+            phase.nbytes = len(out)
+
+        if proc.returncode == 0:
+            was_successful = True
+
+        return out.decode("utf-8").strip(), was_successful
+
+    def slugify(self, text):
+        """
+        Return the slug for a string, as used in entry names.
+
+        Uses the in-process make_slug() unless an external slug command is
+        set, in which case results are memoised (optionally on disk) so each
+        string only costs a fork once.
+        """
+        if not self.slug_cmd:
+            return make_slug(text)
+        return self.slugify_all([text])[text]
+
+    def slugify_all(self, texts):
+        """
+        Return a dict of strings to their slugs, as slugify() but in one batch:
+        an external slug command is run concurrently for the uncached strings,
+        and the slug cache is only saved once.
+        """
+        import pickle
+        if not self.slug_cmd:
+            return {text: make_slug(text) for text in texts}
+
+        if self.__slug_cache is None:
+            self.__slug_cache = {}
+            if self.slug_cache_persist:
+                try:
+                    with open(self.get_cache_file(JournalCtl.SLUG_CACHE_FILE), "rb") as f:
+                        self.__slug_cache = pickle.load(f)
+                except (OSError, EOFError, pickle.UnpicklingError):
+                    pass
+
+        missing = list({text for text in texts if text not in self.__slug_cache})
+        if missing:
+            import concurrent.futures
+            jobs = self.scan_jobs if self.scan_jobs > 1 else os.cpu_count()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+                results = executor.map(lambda text: self.get_shell([self.slug_cmd, text]),
+                        missing)
+                for text, (slug, ret) in zip(missing, results):
+                    if not ret:
+                        self.error("slug command '{}' failed".format(self.slug_cmd),
+                                JournalCtl.ERR_NOT_VALID)
+                    self.__slug_cache[text] = slug
+            if self.slug_cache_persist:
+                cache_file = self.get_cache_file(JournalCtl.SLUG_CACHE_FILE)
+                with open(cache_file + ".tmp", "wb") as f:
+                    pickle.dump(self.__slug_cache, f, pickle.HIGHEST_PROTOCOL)
+                os.replace(cache_file + ".tmp", cache_file)
+        return {text: self.__slug_cache[text] for text in texts}
+
+    def run_interactive(self, args, cwd=None):
+        """
+        Run an interactive shell command and return the exit code.
+
+        Blocks execution while the command is running.
+        """
+        import subprocess
+        # run it in self.journal_dir, or given directory
+        if cwd:
+            run_dir = cwd
+        else:
+            run_dir = self.journal_dir
+        with self.timed("interactive " + os.path.basename(args[0])):
+            return subprocess.call(args, cwd=run_dir)
+
+    def timed(self, phase):
+        """Return a context manager recording a block as a phase, if timing."""
+        if self.timings is None:
+            return Untimed()
+        return self.timings.Phase(self.timings, phase)
+
+    def report_timings(self):
+        """Print the timings of this run, if timing."""
+        if self.timings is not None:
+            self.timings.report()
+
+    def execute_cmd(self):
+        """Try to run something based on the command given."""
+        spec = self.find_command(self.command)
+        if spec is None:
+            self.error(
+                    "No such command '{}'".format(self.command),
+                    JournalCtl.ERR_NO_SUCH_CMD)
+        name, alias, cmd_class, preset_args = spec
+        with self.timed("command " + name):
+            self.load_command(cmd_class).exec(preset_args + self.arguments)
+
+    def find_command(self, command):
+        """Return the manifest entry for a command name or alias, or None."""
+        for spec in JournalCtl.COMMANDS:
+            if command == spec[0] or command == spec[1]:
+                return spec
+        return None
+
+    def load_command(self, cmd_class):
+        """Import a command's module and return an instance of the command."""
+        import importlib
+        module_name, class_name = cmd_class.split(":")
+        return getattr(importlib.import_module(module_name), class_name)(self)
+
+    def cmd_help(self, arguments):
+        if arguments:
+            spec = self.find_command(arguments[0])
+            if spec is None:
+                self.error(
+                        "No such command '{}'".format(arguments[0]),
+                        JournalCtl.ERR_NO_SUCH_CMD)
+            self.load_command(spec[2]).print_help()
+        else:
+            print("Available commands: {}".format(", ".join(
+                name for name, alias, cmd_class, preset_args
+                    in JournalCtl.COMMANDS if not preset_args)))
+
+    def cmd_recent(self):
+        # now pretty-print them
+        for title in self.recent_titles():
+            print(title)
+
+    def recent_titles(self):
+        """Return the titles of the last X entries, oldest to newest."""
+        import heapq
+        remote = self.remote("recent")
+        if remote is not None:
+            return remote
+
+        # get the last X entries (without sorting the whole journal)
+        if self.use_catalogue:
+            recent_entries = self.get_catalogue().recent(self.recent_num,
+                    self.since, self.until)
+        else:
+            recent_entries = sorted(heapq.nlargest(self.recent_num,
+                (entry for entry in self.iter_entries(self.since, self.until)
+                    if self.in_date_range(entry))))
+
+        return [self.get_title(entry) for entry in recent_entries]
+
+    def cmd_list(self):
+        """List entries and their titles, filtered by date range and tag."""
+        if self.use_catalogue:
+            titles = self.get_catalogue().titles(self.since, self.until,
+                    self.args.tag)
+        else:
+            from catalogue import Catalogue
+            titles = []
+            for entry in sorted(self.iter_entries(self.since, self.until)):
+                if not self.in_date_range(entry):
+                    continue
+                if self.args.tag:
+                    tags = []
+                    for var in Catalogue.LIST_FIELDS:
+                        value = self.get_front_matter(entry, var)
+                        if value:
+                            tags += Catalogue.split_list(value)
+                    if self.args.tag not in tags:
+                        continue
+                titles.append((entry, self.get_title(entry)))
+
+        for entry, title in titles:
+            print("{}: {}".format(entry, title))
+
+    def in_date_range(self, entry):
+        """
+        Return whether an entry's date (its 'YYYY-MM-DD' name prefix) is within
+        the range given by --since/--until, if any.
+
+        Dates may be partial (e.g. '2014' or '2014-03'): --since compares as
+        the start of that period, --until as the end.
+        """
+        date = entry[:10]
+        if self.since and date < self.since:
+            return False
+        if self.until and date[:len(self.until)] > self.until:
+            return False
+        return True
+
+    @staticmethod
+    def split_scope(arguments):
+        """
+        Split command arguments into (keywords, globs), where globs are the
+        arguments starting with a date and containing glob characters (e.g.
+        '2014-*'), which scope a command to the entries with names matching
+        any of them. Other arguments are taken literally, so titles &
+        keywords can contain '?', '*' or '['.
+        """
+        keywords, globs = [], []
+        for arg in arguments:
+            is_glob = JournalCtl.DATE_PREFIX_RE.match(arg) \
+                    and JournalCtl.SCOPE_GLOB_RE.search(arg)
+            (globs if is_glob else keywords).append(arg)
+        return keywords, globs
+
+    def is_scoped(self, globs):
+        return bool(globs or self.since or self.until)
+
+    def in_scope(self, entry, globs):
+        """Return whether an entry is within --since/--until and any globs."""
+        import fnmatch
+        if not self.in_date_range(entry):
+            return False
+        return not globs or any(fnmatch.fnmatchcase(entry, glob) for glob in globs)
+
+    def get_scoped_entries(self, globs):
+        """
+        Return the sorted names of entries within --since/--until and matching
+        any of globs.
+
+        With the catalogue or name index, only the ranges of (already sorted)
+        names that the date range and each glob's literal prefix cover are
+        looked up. Otherwise names are filtered as the entries are listed,
+        skipping date subdirectories outside the scope.
+        """
+        prefixes = [JournalCtl.SCOPE_GLOB_RE.split(glob, 1)[0] for glob in globs]
+        if self.use_catalogue or self.use_index:
+            if self.use_catalogue:
+                lookup = self.get_catalogue()
+            else:
+                lookup = self.get_name_index()
+            names = set()
+            for prefix in prefixes or [""]:
+                # partial dates (e.g. '2014-03') include the whole period
+                low = max(prefix, self.since or "")
+                high = min(prefix + "\uffff", (self.until or "") + "\uffff")
+                names.update(lookup.names_between(low, high))
+        else:
+            since, until = self.since, self.until
+            if prefixes and not since and not until:
+                # only list date subdirectories the globs could match
+                dates = [JournalCtl.DATE_PREFIX_RE.match(prefix).group(0)
+                        for prefix in prefixes]
+                since, until = min(dates), max(dates)
+            names = self.iter_entries(since, until)
+        return sorted(name for name in names if self.in_scope(name, globs))
+
+    def get_git_status(self):
+        """
+        Get and parse the output of `git status` for the entry directory into
+        an easier format to manipulate: a list of [change, path] pairs, where
+        change is e.g. '??' (untracked) or 'M' (modified) and path is from the
+        repo root.
+        """
+        remote = self.remote("status")
+        if remote is not None:
+            return remote
+
+        return list(self.iter_git_status())
+
+    def iter_git_status(self):
+        """
+        Stream `git status --porcelain=v2 -z` records for the entry directory,
+        yielding [change, path] pairs as they're read.
+
+        Paths may contain any characters (including spaces & newlines); for
+        renames, the new path is given.
+        """
+        import subprocess
+        cmd = ["git"]
+        if self.git_untracked_cache:
+            cmd += ["-c", "core.untrackedCache=true"]
+        if self.git_fsmonitor:
+            cmd += ["-c", "core.fsmonitor=true"]
+        cmd += ["status", "--porcelain=v2", "-z", "--untracked-files=all",
+                "--", self.entry_dir]
+
+        with self.timed("stream git status") as phase:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, cwd=self.journal_dir)
+            with proc.stdout:
+                records = self.__iter_nul_records(proc.stdout)
+                for record in records:
+                    phase.nbytes += len(record) + 1
+                    kind = record[:1]
+                    if kind == b"1":
+                        # 1 XY sub mH mI mW hH hI path
+                        fields = record.split(b" ", 8)
+                        yield [JournalCtl.git_change(fields[1]), os.fsdecode(fields[8])]
+                    elif kind == b"2":
+                        # 2 XY sub mH mI mW hH hI Xscore path, then original path
+                        fields = record.split(b" ", 9)
+                        next(records, None)
+                        yield [JournalCtl.git_change(fields[1]), os.fsdecode(fields[9])]
+                    elif kind == b"u":
+                        # u XY sub m1 m2 m3 mW h1 h2 h3 path
+                        fields = record.split(b" ", 10)
+                        yield [JournalCtl.git_change(fields[1]), os.fsdecode(fields[10])]
+                    elif kind == b"?":
+                        yield [JournalCtl.GIT_UNTRACKED, os.fsdecode(record[2:])]
+                    # skip ignored files (!) & headers (#)
+
+            proc.wait()
+        if proc.returncode != 0:
+            self.error("git status failed (error code {})".format(proc.returncode),
+                    JournalCtl.ERR_GIT)
+
+    @staticmethod
+    def git_change(xy):
+        """
+        Turn a porcelain v2 XY status into the short form jctl uses, e.g.
+        '.M' -> 'M' (as the whitespace-stripped porcelain v1 status was).
+        """
+        return xy.decode("ascii").replace(".", "")
+
+    def __iter_nul_records(self, stream, chunk_size=64 * 1024):
+        """Yield NUL-terminated records from a binary stream as it's read."""
+        pending = b""
+        while True:
+            chunk = stream.read1(chunk_size)
+            if not chunk:
+                break
+            records = (pending + chunk).split(b"\0")
+            pending = records.pop()
+            yield from records
+        if pending:
+            yield pending
+
+    def cmd_status(self):
+        """Print the dirty/untracked files in the journal repo."""
+        git_status = self.get_git_status()
+        if len(git_status) == 0:
+            self.message("No dirty/untracked files")
+        for line in git_status:
+            print("{:>2} {}".format(line[0], line[1]))
+
+    def cmd_commit(self, arguments):
+        """
+        Try to commit a number of files, depending on repo conditions and
+        arguments.
+
+        For now, it will commit 1 file at most.
+
+        Current behaviour:
+          * if exactly 1 untracked file:
+              * commit using arguments[0] if present and end
+          * else search for entries using arguments as keywords
+              * title chooser (default value/pre-entered stuff?)
+              * if exactly 1 match, commit it and end
+              * else use number chooser
+        """
+        if self.args.all:
+            if self.commit_msg or self.edit_commit:
+                self.error("-m/--msg and -e/--edit can't be used with --all",
+                        JournalCtl.ERR_WRONG_ARGS)
+            self.commit_all(arguments)
+            return
+
+        c_git_entry = None
+        c_title = None
+        c_type = None
+
+        git_status = self.get_git_status()
+
+        # test for simple conditions
+        # Guaranteed to either exit or set c_git_entry, c_title and c_type .
+        # If c_title isn't changed from the default it's automagically taken
+        # from the entry when committing.
+        if len(git_status) == 0:
+            self.message("No dirty/untracked files to commit")
+            self.exit(JournalCtl.ERR_NONE_FOUND)
+        else:
+            valid_entries = []
+
+            keywords, globs = self.split_scope(arguments)
+            if len(arguments) == 0 and not self.is_scoped(globs):
+                self.log("cmd_commit: no args, choosing from all dirty files")
+                valid_entries = git_status
+            else:
+                # test arguments against available dirty files
+                for line in git_status:
+                    entry = self.get_entry_from_git_path(line[1])
+
+                    # search for keywords in dirty files
+                    # keywords are all arguments except last
+                    if all(word in entry for word in keywords) \
+                            and self.in_scope(entry, globs):
+                        valid_entries.append(line)
+
+            # choose 1 entry from matched entries
+            if len(valid_entries) == 0:
+                self.message("No dirty entries found for your query.")
+                self.exit(JournalCtl.ERR_NONE_FOUND)
+            else:
+                index = self.interactive_number_chooser(
+                        [self.get_entry_from_git_path(line[1])
+                            for line in valid_entries])
+                if index == -1:
+                    # hit Ctrl-C / cancelled it
+                    self.message("Selection cancelled, exiting")
+                    self.exit(JournalCtl.ERR_SELECT_CANCEL)
+                c_type = valid_entries[index][0]
+                c_git_entry = valid_entries[index][1]
+
+                # set entry title part of commit message after entry name
+                if self.commit_msg:
+                    c_title = self.commit_msg
+                else:
+                    # let commit_entry() work it out
+                    c_title = None
+
+        # commit file
+        self.commit_entry(c_git_entry, c_type, c_title)
+
+    def is_entry(self, entry):
+        return os.path.isfile(self.get_entry_file(entry))
+
+    def commit_entry(self, git_entry, change, title):
+        entry = self.get_entry_from_git_path(git_entry)
+        if not self.is_entry(entry):
+            self.error("can't commit a non-entry file",
+                    JournalCtl.ERR_WRONG_ARGS)
+
+        if change not in (JournalCtl.GIT_UNTRACKED, JournalCtl.GIT_MODIFIED):
+            # something else (are there any other types of changes?)
+            self.error("didn't understand git file status (not '{}' or '{}')".
+                    format(JournalCtl.GIT_MODIFIED, JournalCtl.GIT_UNTRACKED),
+                    JournalCtl.ERR_NOT_VALID)
+
+        # form commit message
+        commit_msg = self.get_commit_msg(entry, change, title)
+
+        # TODO: reset all before doing stuff -- be safe
+        if self.edit_commit:
+            # editing commit message interactively
+            self.log("git add-ing entry")
+            self.run_interactive([
+                "git", "add",
+                ":/:" + git_entry])
+            self.message("Bringing up Git commit dialogue...")
+            self.run_interactive([
+                "git", "commit", "-e",
+                "-m", commit_msg])
+        else:
+            # ask whether to commit
+            self.message("About to commit:")
+            self.message(" > {}".format(entry))
+            self.message(" >   * {}".format(commit_msg))
+            ret = self.__yn_prompt("OK to add & commit?")
+            if ret == 0:
+                self.log("git add-ing entry")
+                self.run_interactive([
+                    "git", "add",
+                    ":/:" + git_entry])
+                self.run_interactive([
+                    "git", "commit",
+                    "-m", commit_msg + self.commit_extra])
+            else:
+                self.message("Exiting...")
+
+    def get_commit_msg(self, entry, change, title=None):
+        """
+        Return the commit message for a change to an entry, in the form
+        'Entry title: new entry'.
+
+        If no title is given, it's taken from the entry's front matter (or
+        name, if the entry was deleted).
+        """
+        entry_title = title
+        if not entry_title:
+            if change == JournalCtl.GIT_DELETED:
+                entry_title = entry
+            else:
+                # empty/None title passed, get from entry front matter
+                entry_title = self.get_title(entry)
+
+        fmt_post = None
+        if change == JournalCtl.GIT_UNTRACKED:
+            self.log("commit: file is untracked")
+            fmt_post = self.commit_msg_new
+        elif change == JournalCtl.GIT_MODIFIED:
+            self.log("commit: file is modified")
+            fmt_post = self.commit_msg_mod
+        elif change == JournalCtl.GIT_DELETED:
+            self.log("commit: file is deleted")
+            fmt_post = self.commit_msg_del
+
+        # strip quotes (used when taking title from front matter)
+        if (entry_title.startswith("\"") and entry_title.endswith("\"")) or \
+                (entry_title.startswith("'") and entry_title.endswith("'")):
+            entry_title = entry_title[1:-1]
+
+        return "{}: {}".format(entry_title, fmt_post)
+
+    def commit_all(self, keywords):
+        """
+        Commit every dirty entry (with names matching all keywords, if any)
+        in one batch, as a single commit or one commit per entry (--each).
+
+        Commits are built with plumbing on a temporary index starting from
+        HEAD, so nothing else that happens to be staged gets committed, and
+        HEAD is only moved (once) after all of them are made. Entries are
+        committed as they are in the working tree, including ones that are
+        already (partly) staged; others (e.g. renames or conflicts) are
+        reported and skipped.
+        """
+        keywords, globs = self.split_scope(keywords)
+        changes = []
+        for status, git_path in self.get_git_status():
+            entry = self.get_entry_from_git_path(git_path)
+            if not (all(word in entry for word in keywords) and self.in_scope(entry, globs)):
+                continue
+            change = JournalCtl.GIT_COMMIT_ALL_CHANGES.get(status)
+            if change is None:
+                self.message("Skipping '{}' (git status '{}'), commit it with git".format(
+                    git_path, status))
+                continue
+            if change != JournalCtl.GIT_DELETED and not self.is_entry(entry):
+                continue
+            changes.append((entry, change, git_path))
+
+        if len(changes) == 0:
+            self.message("No dirty entries to commit")
+            self.exit(JournalCtl.ERR_NONE_FOUND)
+
+        msgs = [self.get_commit_msg(entry, change) for entry, change, path in changes]
+        if self.args.each or len(changes) == 1:
+            commits = [([path], msg) for (entry, change, path), msg in zip(changes, msgs)]
+        else:
+            commits = [([path for entry, change, path in changes],
+                self.commit_msg_batch.format(len(changes)) + "\n\n"
+                    + "\n".join(msgs))]
+
+        self.message("About to commit:")
+        for paths, msg in commits:
+            self.message(" > {}".format(msg.split("\n")[0]))
+            for line in msg.split("\n")[2:]:
+                self.message(" >   * {}".format(line))
+        if self.__yn_prompt("OK to commit {} entries in {} commit(s)?".format(
+                len(changes), len(commits))) != 0:
+            self.message("Exiting...")
+            return
+
+        head = self.get_shell(["git", "rev-parse", "-q", "--verify", "HEAD"])[0]
+        parent = head or None
+        tmp_index = "{}/jctl-index".format(self.get_shell(
+            ["git", "rev-parse", "--absolute-git-dir"])[0])
+        env = {"GIT_INDEX_FILE": tmp_index}
+        try:
+            if parent:
+                self.__git_plumbing(["git", "read-tree", parent], env=env)
+            for paths, msg in commits:
+                self.__git_plumbing(
+                        ["git", "update-index", "--add", "--remove", "-z", "--stdin"],
+                        input=self.__nul_paths(paths), env=env)
+                tree = self.__git_plumbing(["git", "write-tree"], env=env)
+                cmd = ["git", "commit-tree", tree, "-F", "-"]
+                if parent:
+                    cmd += ["-p", parent]
+                parent = self.__git_plumbing(cmd,
+                        input=(msg + self.commit_extra).encode("utf-8"))
+        finally:
+            if os.path.exists(tmp_index):
+                os.remove(tmp_index)
+
+        self.__git_plumbing(["git", "update-ref", "-m",
+            "commit (jctl): " + commits[-1][1].split("\n")[0],
+            "HEAD", parent, head or JournalCtl.GIT_NULL_SHA])
+        # bring the real index in line for just the committed entries
+        self.__git_plumbing(
+                ["git", "update-index", "--add", "--remove", "-z", "--stdin"],
+                input=self.__nul_paths([path for entry, change, path in changes]))
+        self.message("Committed {} entries in {} commit(s)".format(
+            len(changes), len(commits)))
+
+    def __nul_paths(self, paths):
+        return b"".join(os.fsencode(path) + b"\0" for path in paths)
+
+    def __git_plumbing(self, args, input=None, env=None):
+        """Run a git plumbing command, erroring out if it fails."""
+        out, ret = self.get_shell(args, input=input, env=env)
+        if not ret:
+            self.error("'{}' failed".format(" ".join(args[:2])), JournalCtl.ERR_GIT)
+        return out
+
+    def get_entry_git_path(self, entry):
+        """
+        Return the path of an entry starting from the journal Git repo root,
+        where entry_layout puts it.
+        """
+        return "{}/{}{}{}".format(self.entry_dir, self.get_entry_subdir(entry),
+                entry, self.entry_ext)
+
+    def get_entry_subdir(self, entry):
+        """
+        Return the subdirectory of the entry directory an entry is kept in
+        (with a trailing slash), following entry_layout: e.g. '2014/03/' for
+        '2014-03-05-title' with the layout '%Y/%m'.
+        """
+        if not self.entry_layout:
+            return ""
+        subdir = self.entry_layout.replace("%Y", entry[0:4]) \
+                .replace("%m", entry[5:7]).replace("%d", entry[8:10])
+        return subdir + "/"
+
+    def get_entry_from_git_path(self, entry):
+        """Return the entry pointed to by a Git path."""
+        return os.path.splitext(os.path.basename(entry))[0]
+
+    def cmd_new(self, arguments):
+        """
+        Create a new entry using a file templater (by default, my Pyplater).
+
+        Note that unlike my previous 'journal' template, the 'jctl-*' templates
+        require that jctl provides the *full* filename. That way the templater
+        doesn't get involved with journal placement.
+        """
+        # we need at least the template name (entry, exam, meal) & title
+        if len(arguments) < 2:
+            self.error("expected at least 2 arguments (got {})".format(
+                len(arguments)), JournalCtl.ERR_WRONG_ARGS)
+
+        # get title & name of new entry
+        entry_title = arguments[1]
+        slug = self.slugify(entry_title)
+        entry_name = "{}-{}".format(time.strftime("%F"), slug)
+        entry_file = self.get_entry_file(entry_name)
+
+        # check that exact file does not exist already
+        if os.path.isfile(entry_file):
+            self.error("entry '{}' already exists".format(entry_name),
+                    JournalCtl.ERR_FILE_EXISTS)
+        os.makedirs(os.path.dirname(entry_file), exist_ok=True)
+
+        # templater command
+        template = JournalCtl.TEMPLATE_PREFIX + arguments[0]
+        template_cmd = [
+                JournalCtl.TEMPLATER_CMD,
+                template,
+                entry_file,
+                entry_title,
+                ]
+
+        # if extra arguments, append them
+        if len(arguments) > 2:
+            for arg in arguments[2:]:
+                template_cmd.append(arg)
+
+        ret = self.run_interactive(template_cmd, cwd=os.getcwd())
+
+        if ret == 0:
+            self.log("templating succeeded")
+        else:
+            self.error("templating failed (error code {})".format(ret),
+                    JournalCtl.ERR_TEMPLATE_FAIL)
+
+        # I use date field as 'last edited' field, so update again when finished
+        # (my Pyplater already fills it in, but only at the start)
+        # since the previous operation may change the entry name, re-grab it)
+        fixed_entry_name = self.update_time(entry_name)
+
+        # ask to commit the new file
+        self.cmd_commit([fixed_entry_name])
+
+    def cmd_edit(self, arguments):
+        if not arguments:
+            self.error("command requires at least 1 argument",
+                    JournalCtl.ERR_WRONG_ARGS)
+        else:
+            matches = self.find_entries(arguments)
+            if len(matches) == 0:
+                self.message("No entries found for your query.")
+                self.exit(JournalCtl.ERR_NONE_FOUND)
+            if len(matches) > 1:
+                self.message("More than one entry found for your query.")
+                # ask user which one to open
+                index = self.interactive_number_chooser(matches, reverse=True)
+                if index == -1:
+                    # hit Ctrl-C / cancelled it
+                    self.message("Selection cancelled, exiting")
+                    self.exit(JournalCtl.ERR_SELECT_CANCEL)
+                else:
+                    # index is valid
+                    e = matches[index]
+                    self.edit_entry(e)
+            else:
+                self.log("one file found")
+                self.edit_entry(matches[0])
+
+    def interactive_number_chooser(self, options, reverse=False):
+        """
+        Show an interactive chooser for a list of options and return the number
+        entered.
+
+        options: an array of strings
+
+        For valid input, return a positive integer for the option's index in
+        the list.
+        For other input (cancelled, empty line), return -1.
+
+        """
+
+        ret_bad_input = -1
+        indent_spaces = 3
+        start_num = 1
+        valid_input = False
+
+        if len(options) == 1:
+            # there is one option. return its index :)
+            return 0
+
+        if reverse:
+            options.reverse()
+
+        print("Please enter the number corresponding to the entry you want to choose:")
+        print()
+
+        if reverse:
+            for i, opt in reversed(list(enumerate(options,start_num))):
+                print("{0:{1}d}) {2}".format(i, indent_spaces, opt))
+        else:
+            for i, opt in enumerate(options, start_num):
+                print("{0:{1}d}) {2}".format(i, indent_spaces, opt))
+
+        while not valid_input:
+            try:
+                ans = input(" > ")
+            except KeyboardInterrupt:
+                # new line so it looks better
+                print()
+                return ret_bad_input
+            except EOFError:
+                print("Ctrl-D pressed, exiting...")
+                return ret_bad_input
+
+            # special input values
+            if ans == "" or ans == "quit" or ans == "q":
+                print("Exiting selection...")
+                return ret_bad_input
+
+            try:
+                int_ans = int(ans)
+            except ValueError:
+                print("ERROR: not an integer. Please try again.")
+                continue
+
+            index = int_ans - start_num
+            if 0 <= index < len(options):
+                valid_input = True
+            else:
+                print("ERROR: entry specified was out of range. Please try again.")
+
+        if reverse:
+            return index
+        return index
+
+    def find_entries(self, keywords):
+        """
+        Try to find entries with filenames matching *every* keyword
+        (case-insensitive).
+
+        keywords: an array of strings
+
+        Return a list of matched entries, sorted from oldest (first) to newest
+        (last/most recent).
+
+        If nothing matches exactly, entries with similar names are returned
+        instead, sorted from least to most similar.
+        """
+        # Make all arguments slugs like the entry names (since we're not using
+        # titles, just 'filenames' essentially).
+        # This means you can search in any of these ways:
+        #
+        #     jctl edit "Exact title, converted to slug using slugify()"
+        #     jctl edit Different keywords which can match in any order
+        #     jctl edit "your-own-slug-converted-is-the-same"
+        #
+        remote = self.remote("find", keywords)
+        if remote is not None:
+            return remote
+
+        keywords, globs = self.split_scope(keywords)
+        keywords = [ self.slugify(word) for word in keywords ]
+
+        if self.is_scoped(globs):
+            # only check names in scope
+            matches = [entry for entry in self.get_scoped_entries(globs)
+                    if all(word.lower() in entry.lower() for word in keywords)]
+            if len(matches) == 0:
+                self.log("no matches found for keywords")
+            return matches
+
+        if self.use_catalogue:
+            matches = self.get_catalogue().match_names(keywords)
+        elif self.use_index:
+            matches = self.get_name_index().find(
+                    [word.lower() for word in keywords])
+        else:
+            # for every entry:
+            #     if all keywords separately found in entry, entry is a match
+            matches = []
+            for entry in self.iter_entries():
+                # be case-insensitive
+                if all(word.lower() in entry.lower() for word in keywords):
+                    matches.append(entry)
+
+        if len(matches) == 0 and self.use_index:
+            similar = self.get_name_index().find_similar(
+                    [word.lower() for word in keywords],
+                    self.fuzzy_threshold, self.fuzzy_limit)
+            if similar:
+                self.message("No exact matches, showing similar entries.")
+                return [entry for entry, score in reversed(similar)]
+
+        if len(matches) == 0:
+            self.log("no matches found for keywords")
+            return []
+
+        if len(matches) > 1:
+            self.log("more than 1 match found for keywords")
+
+        return sorted(matches)
+
+    def cmd_search(self, arguments):
+        """Search for keywords in full journal text."""
+
+        if not arguments:
+            # we didn't get any arguments
+            self.error("need at least 1 argument to search for",
+                    JournalCtl.ERR_WRONG_ARGS)
+
+        if self.args.history:
+            self.cmd_search_history(arguments)
+            return
+
+        # get matches for *all* keywords
+        if self.rank:
+            # best first, rather than oldest to newest
+            ranked, num_matches = self.search_ranked(arguments, self.search_limit)
+            matches_all = [entry for entry, score in ranked]
+        else:
+            matches_all = self.search_entries(arguments)
+            num_matches = len(matches_all)
+
+        # pretty-print 'all' matches
+        if num_matches == 0:
+            self.message("No matches found for your query")
+            self.exit(JournalCtl.SUCCESS)
+        elif num_matches == 1:
+            self.message("1 match found")
+        elif num_matches > 1:
+            self.message("Many matches found")
+
+        if self.rank:
+            if self.args.scores:
+                display = ["{} ({:.3f})".format(entry, score) for entry, score in ranked]
+            else:
+                display = list(matches_all)
+            if len(ranked) < num_matches:
+                self.message("Showing the best {} of {}".format(len(ranked), num_matches))
+        else:
+            display = matches_all
+
+        yn = self.__yn_prompt("Open a matched entry?")
+        if yn == 0:
+            index = self.interactive_number_chooser(display, reverse=not self.rank)
+            if index == -1:
+                self.message("Selection cancelled, exiting")
+                self.exit(JournalCtl.ERR_SELECT_CANCEL)
+            else:
+                self.edit_entry(matches_all[index])
+        elif yn == 1:
+            self.message("Matches found in entries:")
+            for match in display:
+                print(" * {}".format(match))
+        else:
+            self.message("ERROR: response wasn't y/n, exiting...")
+
+    def cmd_search_history(self, arguments):
+        """Search entry history, printing the matching commits & entries."""
+        matches = self.search_history(arguments)
+        if len(matches) == 0:
+            self.message("No matches found in history for your query")
+            return
+        self.message("Matches found in entry history:")
+        for commit, entry in matches:
+            print(" * {} {}".format(commit[:12], entry))
+
+    def search_history(self, keywords):
+        """
+        Search every distinct past revision of the entries in Git history for
+        a query.
+
+        Revisions are streamed through a single `git cat-file --batch`
+        process, and each distinct blob is only checked once.
+
+        Glob arguments (e.g. '2014-*') and --since/--until limit the search
+        to revisions of entries in scope, as for search_entries().
+
+        Return a list of (commit, entry) pairs naming the newest commit that
+        introduced each matching revision, sorted by entry then newest first.
+        """
+        import subprocess
+        from query import Query
+        keywords, globs = self.split_scope(keywords)
+        query = Query(keywords)
+        revisions = [(blob, commit, self.get_entry_from_git_path(path))
+                for blob, commit, path in self.iter_entry_revisions()]
+        revisions = [rev for rev in revisions
+                if self.in_scope(rev[2], globs) and query.match_name(rev[2])]
+        self.log("checking {} distinct entry revisions".format(len(revisions)))
+
+        matches = []
+        with self.timed("stream git cat-file") as phase:
+            proc = subprocess.Popen(["git", "cat-file", "--batch"],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=self.journal_dir)
+            try:
+                for order, (blob, commit, entry) in enumerate(revisions):
+                    proc.stdin.write(blob.encode("ascii") + b"\n")
+                    proc.stdin.flush()
+                    header = proc.stdout.readline().split()
+                    if len(header) != 3:
+                        # "<blob> missing" (e.g. a shallow clone)
+                        continue
+                    data = proc.stdout.read(int(header[2]))
+                    phase.nbytes += len(data)
+                    proc.stdout.read(1)
+                    if query.match_data(entry, data):
+                        matches.append((entry, order, commit))
+            finally:
+                proc.stdin.close()
+                proc.stdout.close()
+                proc.wait()
+
+        return [(commit, entry) for entry, order, commit in sorted(matches)]
+
+    def iter_entry_revisions(self):
+        """
+        Yield (blob, commit, path) for every distinct revision of a file in the
+        entry directory across all of Git history, newest first.
+
+        Each blob is given once, with the newest commit that introduced it.
+        """
+        import subprocess
+        seen = set()
+        commit = None
+        with self.timed("stream git log") as phase:
+            proc = subprocess.Popen(["git", "log", "--all", "--no-renames", "--raw",
+                "--no-abbrev", "-z", "--format=commit %H", "--", self.entry_dir],
+                stdout=subprocess.PIPE, cwd=self.journal_dir)
+            with proc.stdout:
+                records = self.__iter_nul_records(proc.stdout)
+                for record in records:
+                    phase.nbytes += len(record) + 1
+                    record = record.lstrip(b"\n")
+                    if record.startswith(b"commit "):
+                        commit = record[7:].decode("ascii")
+                    elif record.startswith(b":"):
+                        # :old_mode new_mode old_blob new_blob status, then path
+                        blob = record.split()[3].decode("ascii")
+                        path = os.fsdecode(next(records, b""))
+                        if blob != JournalCtl.GIT_NULL_SHA and blob not in seen:
+                            seen.add(blob)
+                            yield blob, commit, path
+            proc.wait()
+        if proc.returncode != 0:
+            self.error("git log failed (error code {})".format(proc.returncode),
+                    JournalCtl.ERR_GIT)
+
+    def __yn_prompt(self, prompt_msg):
+        """
+        Prompt the user with a yes/no question.
+
+        Return 0 for 'yes'.
+        Return 1 for 'no'.
+        Return -1 for invalid input.
+        """
+        ret_y = 0
+        ret_n = 1
+        ret_invalid = -1
+
+        try:
+            yn = input(prompt_msg + " (y/n) ").lower()
+        except KeyboardInterrupt:
+            # new line so it looks better
+            print()
+            return ret_invalid
+        except EOFError:
+            return ret_invalid
+        if yn == "y" or yn == "yes":
+            return ret_y
+        elif yn == "n" or yn == "no":
+            return ret_n
+        else:
+            return -1
+
+    def search_entries(self, keywords, sort=True):
+        """
+        Try to find entries matching a query in the text. In the simplest
+        case, a valid match is *each of* of the keywords found in text (see
+        Query for the full syntax).
+
+        Glob arguments (e.g. '2014-*') and --since/--until limit the search
+        to entries in scope, so only those are ever read.
+
+        Uses the search index (if enabled) to avoid reading every entry.
+
+        Return a list of matches, sorted oldest to newest unless sort is
+        False (e.g. when they're only going to be ranked).
+        """
+        remote = self.remote("search", keywords, sort)
+        if remote is not None:
+            return remote
+
+        from query import Query
+        keywords, globs = self.split_scope(keywords)
+        query = Query(keywords)
+        scope = None
+        if self.is_scoped(globs):
+            scope = self.get_scoped_entries(globs)
+
+        if self.use_index and self.use_search_index:
+            index = self.get_search_index()
+            matches, unverified = index.query(query.required_keywords())
+            if scope is not None:
+                scope = set(scope)
+                matches, unverified = matches & scope, unverified & scope
+            if query.is_simple():
+                matches = list(matches)
+            else:
+                # the index can only narrow down the candidates
+                matches, unverified = [], matches | unverified
+        else:
+            matches = []
+            unverified = scope if scope is not None else self.get_entries()
+
+        # check the text of every entry we couldn't rule in/out
+        unverified = [entry for entry in unverified if query.match_name(entry)]
+        matches += self.scan_entries(unverified, query)
+
+        if len(matches) == 0:
+            self.log("no matches found for keywords")
+            return []
+
+        if len(matches) > 1:
+            self.log("more than 1 match found for keywords")
+
+        return sorted(matches) if sort else matches
+
+    def scan_entries(self, entries, query, tokens=None):
+        """
+        Return the entries matching a Query by checking their text, sorted
+        oldest to newest. Given ranking tokens, return a record for each
+        entry instead (see scan_files()).
+
+        If more than one scan job is set, the entries are sharded across a
+        pool of worker processes (or threads) and the results merged.
+        """
+        entries = sorted(entries)
+        archived = []
+        if self.use_archive:
+            archive = self.get_archive()
+            stats = self.get_entry_stats()
+            archived = [entry for entry in entries
+                    if archive.is_fresh(entry, stats.get(entry))]
+            if archived:
+                self.log("scanning {} archived entries".format(len(archived)))
+                archived_set = set(archived)
+                entries = [entry for entry in entries if entry not in archived_set]
+                with self.timed("scan archive"):
+                    archived = archive.scan(archived, query, tokens)
+
+        from query import scan_files
+        files = [(entry, self.get_entry_file(entry)) for entry in entries]
+        matches = self.map_files("scan entries", scan_files, files, query, tokens)
+        return sorted(matches + archived) if archived else matches
+
+    def map_files(self, phase, func, files, *args):
+        """
+        Return the results of func(files, *args) for a list of (entry,
+        filename) pairs, where func returns (results, nbytes): a list in the
+        order given and the bytes it read. func must be a module-level
+        function (and its arguments picklable), so that it can run in a
+        worker process.
+
+        If more than one scan job is set, the files are sharded across a pool
+        of worker processes (or threads) and the results concatenated.
+
+        When timing, the files, bytes and time taken are recorded as the
+        phase; with several workers the time is their total.
+        """
+        import concurrent.futures
+        jobs = self.scan_jobs if self.scan_jobs > 0 else os.cpu_count()
+
+        if jobs <= 1 or len(files) <= 1:
+            results, nbytes, seconds = run_timed(func, files, *args)
+        else:
+            if self.args.threads:
+                executor = concurrent.futures.ThreadPoolExecutor(max_workers=jobs)
+            else:
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+
+            # contiguous shards of the sorted list, so results concatenate in order
+            num_chunks = min(len(files), jobs * self.scan_chunks_per_job)
+            chunk_size = -(-len(files) // num_chunks)
+            self.log("scanning {} entries in {} chunks using {} workers".format(
+                len(files), num_chunks, jobs))
+            with executor:
+                futures = [executor.submit(run_timed, func, files[i:i+chunk_size], *args)
+                        for i in range(0, len(files), chunk_size)]
+                results = []
+                nbytes = 0
+                seconds = 0.0
+                for future in futures:
+                    chunk_results, chunk_bytes, chunk_seconds = future.result()
+                    results += chunk_results
+                    nbytes += chunk_bytes
+                    seconds += chunk_seconds
+
+        if self.timings is not None and files:
+            self.timings.add(phase, seconds, nbytes, count=len(files))
+        return results
+
+    def get_cache_file(self, name):
+        """
+        Return the path of a jctl cache file in the journal directory, creating
+        the cache directory (ignored by Git) if required.
+        """
+        cache_dir = "{}/{}".format(self.journal_dir, JournalCtl.CACHE_DIR)
+        if not os.path.isdir(cache_dir):
+            os.mkdir(cache_dir)
+            with open(cache_dir + "/.gitignore", JournalCtl.WRITE_ONLY) as f:
+                f.write("*\n")
+        return "{}/{}".format(cache_dir, name)
+
+    def get_search_index(self):
+        """
+        Load the search index and update it for any changed entries (once per
+        run).
+        """
+        from searchindex import SearchIndex
+        if self.__search_index is not None:
+            return self.__search_index
+        index = SearchIndex(self.get_cache_file(JournalCtl.SEARCH_INDEX_FILE))
+        count = index.update(self.get_entry_stats(), self.get_text_of)
+        if count:
+            self.log("search index: (re-)indexed {} entries".format(count))
+        self.__search_index = index
+        return index
+
+    def get_name_index(self):
+        """
+        Load the entry name index, updating it for any added/removed entries
+        if the entry directories have changed since it was last updated.
+        """
+        from nameindex import NameIndex
+        if self.__name_index is not None:
+            return self.__name_index
+        index = NameIndex(self.get_cache_file(JournalCtl.NAME_INDEX_FILE))
+        self.__update_name_index(index)
+        self.__name_index = index
+        return index
+
+    def __update_name_index(self, index):
+        # the directories listed last time cover any added since
+        known = index.dirs()
+        if known and index.is_current(self.get_entry_dir_mtimes(list(known))):
+            return
+        dir_mtimes = self.get_entry_dir_mtimes()
+        count = index.update(set(self.iter_entries()), dir_mtimes)
+        if count:
+            self.log("name index: {} entries added/removed".format(count))
+
+    def search_ranked(self, keywords, limit):
+        """
+        Search for a query as search_entries() does, and rank the matches by
+        relevance to its keywords (BM25).
+
+        If searching with the index, its term statistics are used. Otherwise
+        the scan counts the keywords as it checks each entry, so the
+        document frequencies and average length are over the entries
+        searched.
+
+        Return (ranked, num_matches): at most limit (entry, score) pairs,
+        best first, and the total number of matches.
+        """
+        remote = self.remote("rank", keywords, limit)
+        if remote is not None:
+            ranked, num_matches = remote
+            return [tuple(pair) for pair in ranked], num_matches
+
+        import heapq
+        from query import Query
+        from searchindex import SearchIndex
+        positive = Query(self.split_scope(keywords)[0]).positive_keywords()
+        if self.use_index and self.use_search_index:
+            matches = self.search_entries(keywords, sort=False)
+            return self.get_search_index().rank(matches, positive, limit), len(matches)
+
+        keywords, globs = self.split_scope(keywords)
+        query = Query(keywords)
+        entries = self.get_scoped_entries(globs) if self.is_scoped(globs) \
+                else self.get_entries()
+        tokens = [token for keyword in positive
+                for token in SearchIndex.TOKEN_RE.findall(keyword)]
+        records = self.scan_entries([entry for entry in entries if query.match_name(entry)],
+                query, tokens)
+        matches = [record for record in records if record[1]]
+        if not matches:
+            return [], 0
+
+        num_files = len(records)
+        avg_length = sum(length for entry, matched, length, tfs in records) / num_files or 1
+        dfs = [sum(1 for entry, matched, length, tfs in records if tfs[i])
+                for i in range(len(tokens))]
+        scores = ((sum(SearchIndex.score(tf, df, num_files, length, avg_length)
+                for tf, df in zip(tfs, dfs) if tf), entry)
+                for entry, matched, length, tfs in matches)
+        return [(entry, score) for score, entry in heapq.nlargest(limit, scores)], len(matches)
+
+    def refresh(self):
+        """
+        Bring state derived from the entry directory up to date, for a
+        long-running process (e.g. a server) where entries may have changed
+        since it was loaded.
+
+        If watching the entry directory, only entries that changed are
+        updated.
+        """
+        if self.__watcher is not None:
+            names, rescan = self.__watcher.changes()
+            if not rescan:
+                self.__apply_changes(names)
+                return
+
+        self.__entries.clear()
+        self.__entry_paths = None
+        stats = None
+        if self.__search_index is not None:
+            stats = self.get_entry_stats()
+            self.__search_index.update(stats, self.get_text_of)
+        if self.__name_index is not None:
+            self.__update_name_index(self.__name_index)
+        if self.__catalogue is not None:
+            self.__catalogue.reconcile(stats or self.get_entry_stats(),
+                    self.__catalogue_record)
+
+    def start_watching(self):
+        """
+        Watch the entry directory for changes, so refresh() only has to
+        update what changed.
+        """
+        from watchers import watch_entries
+        self.__watcher = watch_entries("{}/{}".format(self.journal_dir, self.entry_dir))
+        self.log("watching entries using {}".format(type(self.__watcher).__name__))
+
+    def __apply_changes(self, names):
+        """Update loaded state for a set of changed (or removed) entries."""
+        if not names:
+            return
+        self.__entry_paths = None
+        changes = {}
+        for entry in names:
+            self.invalidate_entry(entry)
+            try:
+                st = os.stat(self.get_entry_file(entry))
+                changes[entry] = (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                changes[entry] = None
+        self.log("updating {} changed entries".format(len(changes)))
+
+        if self.__search_index is not None:
+            self.__search_index.apply_changes(changes, self.get_text_of)
+        if self.__name_index is not None:
+            for entry, stat in changes.items():
+                if stat is None:
+                    self.__name_index.remove(entry)
+                else:
+                    self.__name_index.add(entry)
+        if self.__catalogue is not None:
+            self.__catalogue.apply_changes(changes, self.__catalogue_record)
+
+    # Daemon {{{
+    def cmd_daemon(self, arguments):
+        """
+        Run a resident jctl server for this journal, or stop a running one
+        ('jctl daemon stop').
+
+        The server keeps the entry list, parsed front matter and search
+        structures in memory, and serves search, edit lookups, recent and
+        status to jctl clients (--daemon) over a Unix socket.
+        """
+        if arguments and arguments[0] == "stop":
+            try:
+                self.__daemon_request({"op": "stop"})
+                self.message("Server stopped")
+            except OSError:
+                self.message("No server running")
+            return
+        self.serve()
+
+    def get_socket_path(self):
+        return self.get_cache_file(JournalCtl.DAEMON_SOCKET_FILE)
+
+    def serve(self):
+        """Serve requests on the daemon socket until stopped or idle."""
+        import json
+        import socket
+        self.serving = True
+        path = self.get_socket_path()
+        if os.path.exists(path):
+            try:
+                self.__daemon_request({"op": "ping"})
+                self.error("a server is already running for this journal",
+                        JournalCtl.ERR_FILE_EXISTS)
+            except OSError:
+                # left over from a server that died
+                os.unlink(path)
+
+        ops = {
+            "search": self.search_entries,
+            "rank": self.search_ranked,
+            "find": self.find_entries,
+            "recent": self.recent_titles,
+            "status": self.get_git_status,
+            "ping": lambda: True,
+        }
+        self.start_watching()
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(path)
+        finally:
+            os.umask(old_umask)
+        sock.listen()
+        sock.settimeout(self.daemon_idle_timeout)
+        self.log("serving on '{}'".format(path))
+        try:
+            while True:
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    self.log("idle for {}s, exiting".format(self.daemon_idle_timeout))
+                    break
+                with conn:
+                    conn.settimeout(None)
+                    try:
+                        request = json.loads(conn.makefile("rb").readline())
+                        op = request["op"]
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        # e.g. a client that hung up before sending anything
+                        self.log("skipping bad request ({!r})".format(e))
+                        continue
+                    if op == "stop":
+                        conn.sendall(b"{\"ok\": true}\n")
+                        break
+                    response = self.__handle_request(request, ops)
+                    try:
+                        conn.sendall(json.dumps(response).encode("utf-8") + b"\n")
+                    except OSError as e:
+                        self.log("couldn't send response ({!r})".format(e))
+        finally:
+            sock.close()
+            os.unlink(path)
+            self.__watcher.close()
+
+    def __handle_request(self, request, ops):
+        """Run a request's op with the client's options, capturing output."""
+        import contextlib
+        import io
+        if request["op"] not in ops:
+            return {"ok": False, "error": "no such op '{}'".format(request["op"])}
+        output = io.StringIO()
+        try:
+            if "options" in request:
+                self.__apply_args(argparse.Namespace(**request["options"]))
+            self.refresh()
+            with contextlib.redirect_stdout(output):
+                result = ops[request["op"]](*request.get("args", []))
+        except SystemExit as e:
+            # the client will redo it in-process to show the error properly
+            return {"ok": False, "error": "exited ({})".format(e.code)}
+        except Exception as e:
+            return {"ok": False, "error": repr(e)}
+        return {"ok": True, "result": result, "output": output.getvalue()}
+
+    def __daemon_request(self, request):
+        """Send a request to the server and return its response."""
+        import json
+        import socket
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.get_socket_path())
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            line = sock.makefile("rb").readline()
+        if not line:
+            raise ConnectionError("no response from server")
+        return json.loads(line)
+
+    def start_daemon(self):
+        """Start a server in the background and wait for it to be ready."""
+        import subprocess
+        self.log("starting server")
+        subprocess.Popen(
+                [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    "jctl.py"), "daemon", "--base", self.journal_dir],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL, start_new_session=True,
+                cwd=self.journal_dir)
+        deadline = time.monotonic() + self.daemon_start_timeout
+        while time.monotonic() < deadline:
+            if os.path.exists(self.get_socket_path()):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def remote(self, op, *args):
+        """
+        If using the daemon, run an op on the server (starting it if needed)
+        and return its result.
+
+        Return None if not using the daemon, or if the server couldn't do it,
+        so the caller can fall back to doing it in-process.
+        """
+        if not self.use_daemon or self.serving:
+            return None
+        request = {"op": op, "args": args, "options": vars(self.args)}
+        with self.timed("daemon " + op):
+            try:
+                response = self.__daemon_request(request)
+            except (OSError, ValueError):
+                if not self.start_daemon():
+                    self.log("couldn't start server, running in-process")
+                    return None
+                try:
+                    response = self.__daemon_request(request)
+                except (OSError, ValueError) as e:
+                    self.log("server request failed ({}), running in-process".format(e))
+                    return None
+        if not response["ok"]:
+            self.log("server couldn't handle '{}' ({}), running in-process".format(
+                op, response.get("error")))
+            return None
+        sys.stdout.write(response["output"])
+        return response["result"]
+    # Daemon }}}
+
+    def get_text_of(self, entry):
+        """Return the contents of the specified entry."""
+        cached = self.__entries.get(entry)
+        if cached is not None:
+            return cached.text()
+        # don't keep bulk reads (e.g. search scans) around in the cache
+        with self.open_entry(entry) as f:
+            return f.read()
+
+    def get_entry(self, entry):
+        """
+        Return the parsed Entry for an entry name, reading the file only if it
+        hasn't already been read (or has since been written to).
+        """
+        cached = self.__entries.get(entry)
+        if cached is None:
+            with self.timed("read front matter") as phase:
+                try:
+                    cached = Entry.read(entry, self.get_entry_file(entry),
+                            self.front_matter_max)
+                except ValueError as e:
+                    self.error("entry '{}': {}".format(entry, e),
+                            JournalCtl.ERR_BAD_FRONT_MATTER)
+                phase.nbytes = cached.body_offset
+            self.__entries[entry] = cached
+        return cached
+
+    def invalidate_entry(self, entry):
+        """Drop any cached data for an entry after its file is changed."""
+        self.__entries.pop(entry, None)
+
+    def open_entry(self, entry):
+        """Return a read-only file handle to the specified entry."""
+        filename = self.get_entry_file(entry)
+        if self.use_archive:
+            archive = self.get_archive()
+            try:
+                st = os.stat(filename)
+            except FileNotFoundError:
+                st = None
+            if st is not None and archive.is_fresh(entry, (st.st_mtime_ns, st.st_size)):
+                import io
+                with self.timed("read archive") as phase:
+                    data = archive.read(entry)
+                    phase.nbytes = len(data)
+                return io.StringIO(data.decode(Entry.ENCODING))
+        if self.timings is None:
+            return open(filename, JournalCtl.READ_ONLY)
+        with self.timed("read entry"):
+            f = open(filename, JournalCtl.READ_ONLY)
+        return self.timings.File(self.timings, "read entry", f)
+
+    def edit_entry(self, entry):
+        """
+        Open an entry in the editor and, if it was changed, replace the entry
+        with the edited file.
+
+        The entry is edited as a copy in the cache directory (on the same
+        filesystem, so it can be reflinked and renamed into place). Changes
+        are detected by a stat fingerprint of the copy, then by content hash,
+        so an unchanged entry is never compared byte for byte.
+        """
+        import shutil
+        import tempfile
+        entry_file = self.get_entry_file(entry)
+
+        tmp_dir = tempfile.mkdtemp(prefix="edit-", dir=self.get_cache_file(""))
+        try:
+            tmp_file = "{}/{}{}".format(tmp_dir, entry, self.entry_ext)
+            copy_file(entry_file, tmp_file)
+            digest = hash_file(entry_file)
+            fingerprint = stat_fingerprint(tmp_file)
+
+            self.log("Opening entry '{}' using '{}'".format(entry, self.editor))
+            self.run_interactive([self.editor, tmp_file])
+
+            # we get here when the file has been closed
+            new_fingerprint = stat_fingerprint(tmp_file)
+            if new_fingerprint == fingerprint or new_fingerprint is None \
+                    or hash_file(tmp_file) == digest:
+                # no changes were made (or the copy was removed)
+                self.message("No changes made")
+                return
+            # move edited copy to original entry
+            shutil.copymode(entry_file, tmp_file)
+            os.replace(tmp_file, entry_file)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.invalidate_entry(entry)
+        self.message("File has been changed")
+        yn = self.__yn_prompt("Update timestamp?")
+        if yn == 0:
+            self.update_time(entry)
+        else:
+            self.message("Exiting...")
+
+    def get_entry_file(self, entry):
+        """
+        Return the full path for a given 'basename' file name (the entry).
+
+        This is where entry_layout puts it, unless the entry is elsewhere in
+        the entry directory (e.g. in a layout not yet applied by `fix --all`),
+        in which case the entry directory is listed (once) to find it.
+
+        Note that the file does *not* need to exist, since we might be opening
+        a new file -- thus other functions must do that checking where
+        required.
+        """
+        entry_file = self.get_entry_layout_file(entry)
+        if os.path.exists(entry_file):
+            return entry_file
+        if self.__entry_paths is None:
+            self.__entry_paths = {os.path.splitext(dirent.name)[0]: dirent.path
+                    for dirent in self.iter_entry_dirents()}
+        return self.__entry_paths.get(entry, entry_file)
+
+    def get_entry_layout_file(self, entry):
+        """
+        Return the full path entry_layout gives an entry, whether or not it's
+        there.
+        """
+        return "{}/{}".format(self.journal_dir, self.get_entry_git_path(entry))
+
+    def get_entries(self):
+        """
+        Return an unsorted list of all entry names.
+
+        In jctl, most functions only deal with the 'slug' as an entry name (i.e.
+        'YYYY-MM-DD-title-slug'). This function return the 'basename' of each
+        entry, without full path *or the extension*.
+        """
+        return list(self.iter_entries())
+
+    def iter_entries(self, since=None, until=None):
+        """
+        Yield all entry names (unsorted) straight from the entry directory.
+
+        If a date range is given, subdirectories outside it are skipped
+        (entries in the range are yielded, but others may be too).
+        """
+        for dirent in self.iter_entry_dirents(since, until):
+            yield os.path.splitext(dirent.name)[0]
+
+    def iter_entry_dirents(self, since=None, until=None):
+        """
+        Yield a DirEntry for each entry file, searching subdirectories of the
+        entry directory. Date-named subdirectories (e.g. '2014' or '2014/03')
+        outside the range since-until (as for --since/--until) aren't listed.
+        """
+        def prune(subdir):
+            parts = subdir.split(os.sep)
+            if not all(part.isdigit() for part in parts):
+                return False
+            date = "-".join(parts)
+            if since and date[:len(since)] < since[:len(date)]:
+                return True
+            if until and date[:len(until)] > until[:len(date)]:
+                return True
+            return False
+
+        return iter_tree("{}/{}".format(self.journal_dir, self.entry_dir),
+                prune if since or until else None)
+
+    def get_entry_dir_mtimes(self, subdirs=None):
+        """
+        Return a dict of the entry directory and every (non-hidden)
+        subdirectory under it, e.g. '' and '2014/03', to their mtimes. Given
+        a list of subdirectories, only those are stat'd, without listing
+        anything (one that's gone gets an mtime of 0).
+
+        Adding, removing or renaming an entry or a subdirectory changes the
+        mtime of the directory it's in, so while all of these are unchanged
+        so are the entry names. Directories changed in the last couple of
+        seconds get an mtime of 0, in case they change again within the same
+        timestamp.
+        """
+        root = "{}/{}".format(self.journal_dir, self.entry_dir)
+        recent = time.time_ns() - 2 * 10**9
+
+        def mtime(subdir):
+            try:
+                st = os.stat(os.path.join(root, subdir))
+            except FileNotFoundError:
+                return 0
+            return st.st_mtime_ns if st.st_mtime_ns < recent else 0
+
+        if subdirs is not None:
+            return {subdir: mtime(subdir) for subdir in subdirs}
+
+        mtimes = {}
+        pending = [""]
+        while pending:
+            subdir = pending.pop()
+            mtimes[subdir] = mtime(subdir)
+            with os.scandir(os.path.join(root, subdir)) as it:
+                for dirent in it:
+                    if dirent.is_dir() and not dirent.name.startswith("."):
+                        pending.append(os.path.join(subdir, dirent.name))
+        return mtimes
+
+    def get_entry_stats(self):
+        """
+        Return a dict of all entry names to their (mtime, size), as used to
+        check whether cached data for an entry is stale.
+        """
+        stats = {}
+        for dirent in self.iter_entry_dirents():
+            st = dirent.stat()
+            stats[os.path.splitext(dirent.name)[0]] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def get_all_front_matter(self, entry):
+        """
+        Retrieve an entry's front matter.
+
+        Return a list holding the all the entry's front matter in the
+        format:
+
+            [
+                ["title", "Example title"],
+                ["date", "1970-01-01 00:00:00"],
+                None
+                ["empty_var", None],
+            ]
+
+        If a variable is not assigned a value, it will be included as in the
+        empty_var row. Empty lines are kept, and indicated by a None element
+        (rather than a list). If an error occurs, the function fails and errors
+        out.
+        """
+
+        cached = self.get_entry(entry)
+        if cached.front_matter is not None:
+            return cached.front_matter
+
+        raw_front_matter = cached.header().strip().split("\n")
+
+        front_matter = []
+        for line in raw_front_matter:
+            parts = line.split(JournalCtl.FRONT_MATTER_VALUE_SEP, 1)
+            if len(parts) == 2:
+                # correct
+                pass
+            elif len(parts) > 2:
+                self.error("somehow split front matter line into >2 parts",
+                        JournalCtl.ERR_BAD_FRONT_MATTER)
+            elif len(parts) == 1 and parts[0] == "":
+                self.log("empty line in front matter")
+                parts = None
+            elif len(parts) == 1 and parts[0] != "":
+                self.log("front matter variable '{}' has no value".format(
+                    parts[0]))
+                parts.append(None)
+            else:
+                self.error("unknown error in front matter",
+                        JournalCtl.ERR_BAD_FRONT_MATTER)
+
+            front_matter.append(parts)
+
+        cached.front_matter = front_matter
+        return front_matter
+
+    def get_front_matter(self, entry, fm_var):
+        """
+        Get the front matter variable specified.
+
+        Try to return the front matter variable with name fm_var. If it isn't
+        found, return None.
+        """
+
+        fm = self.get_all_front_matter(entry)
+        for val in fm:
+            if val and val[0] == fm_var:
+                return val[1]
+
+        # didn't find fm_var
+        return None
+
+    def get_title(self, entry):
+        """Return an entry's title, without any quotes around it."""
+        if self.use_catalogue:
+            title = self.get_catalogue().title(entry)
+            if title is not None:
+                return title
+
+        title = self.get_front_matter(entry, "title")
+        if title is None:
+            return None
+
+        # strip quotes (used when taking title from front matter)
+        return strip_quotes(title)
+
+    def get_archive(self):
+        """Return the pack of archived entries (which may be empty)."""
+        if self.__archive is None:
+            from archivepack import ArchivePack
+            self.__archive = ArchivePack(self.get_cache_file(JournalCtl.ARCHIVE_FILE))
+            self.__archive.load()
+        return self.__archive
+
+    def cmd_archive(self, arguments):
+        """
+        Build or refresh the compressed pack of entries older than archive_age
+        days (or, given 'clear', remove it).
+
+        Entries already packed unchanged are copied across without being read
+        or compressed again.
+        """
+        archive = self.get_archive()
+        if arguments and arguments[0] == "clear":
+            archive.close()
+            try:
+                os.unlink(archive.path)
+            except FileNotFoundError:
+                pass
+            self.message("Archive removed")
+            return
+
+        cutoff = time.strftime("%F", time.localtime(time.time()
+                - self.archive_age * 24 * 60 * 60))
+        stats = {}
+        for dirent in self.iter_entry_dirents(until=cutoff):
+            entry = os.path.splitext(dirent.name)[0]
+            if entry[:10] < cutoff:
+                st = dirent.stat()
+                stats[entry] = (dirent.path, st.st_mtime_ns, st.st_size)
+        compressed = archive.build(stats, self.archive_codec)
+        self.message("Archived {} entries from before {} ({} (re)compressed, {} bytes)".format(
+            len(stats), cutoff, compressed, os.path.getsize(archive.path)))
+
+    def get_catalogue(self):
+        """
+        Return the entry catalogue, reconciling it with the entry directory on
+        first use.
+        """
+        if self.__catalogue is None:
+            from catalogue import Catalogue
+            self.__catalogue = Catalogue(self.get_cache_file(JournalCtl.CATALOGUE_FILE))
+            count = self.__catalogue.reconcile(self.get_entry_stats(),
+                    self.__catalogue_record)
+            if count:
+                self.log("catalogue: (re-)catalogued {} entries".format(count))
+        return self.__catalogue
+
+    def __catalogue_record(self, entry):
+        """Read an entry once for its catalogue record (title, fields, hash)."""
+        import hashlib
+        entry_file = self.get_entry_file(entry)
+        with open(entry_file, "rb") as f:
+            data = f.read()
+        self.__entries[entry] = Entry.from_text(entry, entry_file,
+                data.decode(Entry.ENCODING))
+        front_matter = [line for line in self.get_all_front_matter(entry) if line]
+        title = self.get_front_matter(entry, "title")
+        # don't keep every entry in memory while building the catalogue
+        self.invalidate_entry(entry)
+
+        if title:
+            title = strip_quotes(title)
+        return title, front_matter, hashlib.sha1(data).hexdigest()
+
+    def get_entry_text(self, entry):
+        return self.get_entry(entry).body()
+
+    def update_time(self, entry):
+        """
+        Fix an entry using its metadata and update its time to the time now.
+        """
+        return self.fix_entry(entry, date=time.strftime("%F %T %z"))
+
+    def fix_entry(self, entry, date=None):
+        """
+        Check that an entry is named correctly (considering its metadata
+        in-file to be accurate) and fix the filename if required.
+
+        If a date is provided, replace the file's 'date' field with it.
+
+        The file is only rewritten if its front matter changes.
+
+        Return the updated entry name (or the original one if unchanged).
+        """
+        front_matter = self.get_all_front_matter(entry)
+
+        new_header = ""
+        old_date = None
+        entry_title = None
+        new_header += JournalCtl.FRONT_MATTER_SEP + "\n"
+        for line in front_matter:
+            if line == None:
+                # empty line
+                new_header += "\n"
+                continue
+
+            var = line[0]
+            value = line[1]
+            if var == "date":
+                # get old date (used to check filename consistency)
+                old_date = value
+                if date != None:
+                    # we were given a date to update to, so do it
+                    value = date
+                    self.message("Timestamp updated ({} -> {}).".format(
+                        line[1], value))
+            if var == "title":
+                # grab the title to check consistency with later
+                entry_title = value
+            if value == None:
+                # empty field, error out
+                self.error("YAML variable '{}' has no value assigned".format(var),
+                        JournalCtl.ERR_BAD_FRONT_MATTER)
+            new_header += "{}: {}\n".format(var, value)
+        new_header += JournalCtl.FRONT_MATTER_SEP + "\n"
+
+        # check that we got a title & date
+        if not entry_title:
+            self.error("no title found in front matter",
+                    JournalCtl.ERR_BAD_FRONT_MATTER)
+        if not old_date:
+            self.error("no date found in front matter",
+                    JournalCtl.ERR_BAD_FRONT_MATTER)
+        new_date = entry_date(date or old_date)
+        if new_date is None:
+            self.error("front matter date '{}' doesn't start with YYYY-MM-DD".format(
+                date or old_date), JournalCtl.ERR_BAD_FRONT_MATTER)
+
+        if new_header != self.get_entry(entry).raw_header:
+            self.rewrite_header(entry, new_header)
+
+        check_entry = new_date + "-" + self.slugify(strip_quotes(entry_title))
+        if entry != check_entry:
+            self.message("Filename is inconsistent with date/title, fixing using metadata")
+            self.rename_entry(entry, check_entry)
+            return check_entry
+        else:
+            return entry
+
+    def rewrite_header(self, entry, new_header):
+        """
+        Replace an entry's front matter (new_header, including separators).
+
+        The new file is written next to the entry with the new header and the
+        body copied across from the old file's body offset (in the kernel
+        where possible), then renamed over the entry. So memory use doesn't
+        depend on the size of the entry, and it's never left half-written.
+        """
+        import shutil
+        import tempfile
+        cached = self.get_entry(entry)
+        entry_file = self.get_entry_file(entry)
+        header_bytes = new_header.encode(Entry.ENCODING)
+
+        # hidden, so it's not taken for an entry
+        fd, tmp_file = tempfile.mkstemp(prefix=".", suffix=".tmp",
+                dir=os.path.dirname(entry_file))
+        try:
+            with open(fd, "wb") as fdst, open(entry_file, "rb") as fsrc:
+                fdst.write(header_bytes)
+                copy_data(fsrc, fdst, cached.body_offset)
+                fdst.flush()
+                os.fsync(fdst.fileno())
+            shutil.copymode(entry_file, tmp_file)
+            os.replace(tmp_file, entry_file)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+
+        # we know what's in the file now, so there's no need to re-read it
+        self.invalidate_entry(entry)
+        self.__entries[entry] = Entry(entry, entry_file, new_header,
+                len(header_bytes), cached.body_text)
+
+    def rename_entry(self, entry, new_entry, entry_file=None):
+        """
+        Rename an entry's file (from entry_file, if it's not where the entry
+        layout says), keeping any cached data for it.
+        """
+        import shutil
+        new_file = self.get_entry_layout_file(new_entry)
+        os.makedirs(os.path.dirname(new_file), exist_ok=True)
+        shutil.move(entry_file or self.get_entry_file(entry), new_file)
+        self.__entry_paths = None
+        cached = self.__entries.pop(entry, None)
+        self.invalidate_entry(new_entry)
+        if cached is not None:
+            cached.name = new_entry
+            cached.path = new_file
+            self.__entries[new_entry] = cached
+        self.log("moved entry ({} -> {})".format(entry, new_entry))
+
+    def cmd_fix(self, arguments):
+        """
+        Check that entries (all of them, or those matching keywords) are named
+        after their front matter date & title, and rename any that aren't.
+        Entries not in the subdirectory given by entry_layout are moved there.
+
+        Front matter is read in parallel (see --jobs) and all the slugs are
+        made in one batch. Only misnamed entries are touched; with --dry-run,
+        nothing is, and the report shows what would be done.
+        """
+        if not self.args.all and not arguments:
+            self.error("command requires keywords or --all",
+                    JournalCtl.ERR_WRONG_ARGS)
+        paths = {os.path.splitext(dirent.name)[0]: dirent.path
+                for dirent in self.iter_entry_dirents(self.since, self.until)}
+        if self.args.all:
+            entries = paths.keys()
+        else:
+            entries = self.find_entries(arguments)
+        entries = sorted(entry for entry in entries if self.in_date_range(entry))
+
+        files = [(entry, paths.get(entry) or self.get_entry_file(entry))
+                for entry in entries]
+        results = self.map_files("check entries", check_files, files,
+                self.front_matter_max)
+        slugs = self.slugify_all([title for entry, date, title, problem in results
+                if title is not None])
+
+        names = set(entries)
+        renames = []
+        problems = 0
+        for (entry, date, title, problem), (_, entry_file) in zip(results, files):
+            if problem is None:
+                check_entry = date + "-" + slugs[title]
+                check_file = self.get_entry_layout_file(check_entry)
+                if check_entry == entry:
+                    if os.path.abspath(entry_file) != os.path.abspath(check_file):
+                        renames.append((entry, entry, entry_file))
+                        self.message("{} -> {}".format(entry,
+                            self.get_entry_git_path(entry)))
+                    continue
+                if check_entry in names or os.path.exists(check_file):
+                    problem = "should be named '{}', which already exists".format(check_entry)
+                else:
+                    names.add(check_entry)
+                    renames.append((entry, check_entry, entry_file))
+                    self.message("{} -> {}".format(entry, check_entry))
+                    continue
+            problems += 1
+            self.message("{}: {}".format(entry, problem))
+
+        if not self.args.dry_run:
+            for entry, check_entry, entry_file in renames:
+                self.rename_entry(entry, check_entry, entry_file)
+            self.__apply_changes({name for rename in renames for name in rename[:2]})
+
+        self.message("Checked {} entries: {} {}, {} with problems{}".format(
+            len(entries), len(renames),
+            "to rename" if self.args.dry_run else "renamed",
+            problems, " (dry run)" if self.args.dry_run else ""))
+        if problems:
+            self.exit(JournalCtl.ERR_BAD_FRONT_MATTER)
+
+    def cmd_push(self):
+        self.message("Pushing...")
+        ret = self.run_interactive(["git", "push"])
+        if ret == 0:
+            self.log("push succeeded")
+        else:
+            self.error("Push failed, error code {}".format(ret),
+                    JournalCtl.ERR_GIT)
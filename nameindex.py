@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+#
+# Index over entry names, for exact & fuzzy lookups (jctl edit etc.).
+#
+
+import re
+
+class NameIndex:
+    """
+    Persistent index over entry names, for fast exact and fuzzy
+    (typo-tolerant) keyword lookups, kept in an SQLite database in the
+    journal's cache directory.
+
+    Exact lookups are substring checks run inside SQLite. Fuzzy lookups use
+    the trigrams of each name's title part (after the date, whose trigrams
+    would match nearly every name), each stored as one packed array of the
+    ids of the names containing it.
+
+    The mtimes of the entry directory and all its subdirectories are stored
+    with the names: adding, removing or renaming an entry (or a directory)
+    changes its directory's mtime, so while they're unchanged the entries
+    don't need listing at all.
+    """
+    VERSION = 3
+    N = 3
+    DATE_PREFIX_RE = re.compile(r"\d{4}-\d\d-\d\d-")
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS names (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS trigrams (
+            gram TEXT PRIMARY KEY,
+            ids BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            mtime INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        import sqlite3
+        self.db = sqlite3.connect(path)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != NameIndex.VERSION:
+            self.db.executescript("""
+                DROP TABLE IF EXISTS dirs;
+                DROP TABLE IF EXISTS trigrams;
+                DROP TABLE IF EXISTS names;
+            """)
+            self.db.executescript(NameIndex.SCHEMA)
+            self.db.execute("PRAGMA user_version = {}".format(NameIndex.VERSION))
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def trigrams(text):
+        return {text[i:i+NameIndex.N] for i in range(len(text) - NameIndex.N + 1)}
+
+    @staticmethod
+    def name_trigrams(name):
+        """Return the trigrams of the title part of an entry name."""
+        match = NameIndex.DATE_PREFIX_RE.match(name)
+        return NameIndex.trigrams(name[match.end() if match else 0:].lower())
+
+    def dirs(self):
+        """Return the {subdir: mtime} dict the index was last updated with."""
+        return dict(self.db.execute("SELECT path, mtime FROM dirs"))
+
+    def is_current(self, dir_mtimes):
+        """
+        Return whether the index was last updated with the entry directories
+        as they are now (a {subdir: mtime} dict). An mtime of 0 (too recent
+        to trust) never counts as unchanged.
+        """
+        return all(dir_mtimes.values()) and self.dirs() == dir_mtimes
+
+    def postings(self, grams):
+        """Return a dict of trigrams to arrays of the ids of names with them."""
+        import array
+        grams = list(grams)
+        rows = self.db.execute("SELECT gram, ids FROM trigrams WHERE gram IN ({})".format(
+            ", ".join("?" * len(grams))), grams)
+        postings = {gram: array.array("I") for gram in grams}
+        for gram, ids in rows:
+            postings[gram].frombytes(ids)
+        return postings
+
+    def __write_postings(self, postings):
+        self.db.executemany("INSERT OR REPLACE INTO trigrams VALUES (?, ?)",
+                ((gram, ids.tobytes()) for gram, ids in postings.items() if ids))
+        self.db.executemany("DELETE FROM trigrams WHERE gram = ?",
+                ((gram,) for gram, ids in postings.items() if not ids))
+
+    def add(self, name):
+        with self.db:
+            self.__add_all([name])
+
+    def remove(self, name):
+        with self.db:
+            self.__remove_all([name])
+
+    def __add_all(self, names):
+        ids = {}
+        for name in names:
+            cursor = self.db.execute("INSERT OR IGNORE INTO names (name) VALUES (?)", (name,))
+            if cursor.rowcount:
+                ids[name] = cursor.lastrowid
+        grams = {}
+        for name, i in ids.items():
+            for gram in NameIndex.name_trigrams(name):
+                grams.setdefault(gram, []).append(i)
+        if grams:
+            postings = self.postings(grams)
+            for gram, new_ids in grams.items():
+                postings[gram].extend(new_ids)
+            self.__write_postings(postings)
+
+    def __remove_all(self, names):
+        import array
+        ids = {}
+        for name in names:
+            row = self.db.execute("SELECT id FROM names WHERE name = ?", (name,)).fetchone()
+            if row is not None:
+                ids[name] = row[0]
+                self.db.execute("DELETE FROM names WHERE id = ?", row)
+        grams = {}
+        for name, i in ids.items():
+            for gram in NameIndex.name_trigrams(name):
+                grams.setdefault(gram, set()).add(i)
+        if grams:
+            postings = self.postings(grams)
+            for gram, old_ids in grams.items():
+                postings[gram] = array.array("I",
+                        (i for i in postings[gram] if i not in old_ids))
+            self.__write_postings(postings)
+
+    def update(self, names, dir_mtimes):
+        """
+        Bring the index in line with the given set of entry names, listed
+        with the entry directories as they are in dir_mtimes.
+
+        Return the number of names added or removed.
+        """
+        known = {row[0] for row in self.db.execute("SELECT name FROM names")}
+        removed = known - names
+        added = names - known
+        with self.db:
+            self.__remove_all(removed)
+            self.__add_all(sorted(added))
+            self.db.execute("DELETE FROM dirs")
+            self.db.executemany("INSERT INTO dirs VALUES (?, ?)", dir_mtimes.items())
+        return len(removed) + len(added)
+
+    def names_between(self, low, high):
+        """Return the names from low up to (not including) high, sorted."""
+        return [row[0] for row in self.db.execute(
+            "SELECT name FROM names WHERE name >= ? AND name < ? ORDER BY name",
+            (low, high))]
+
+    def find(self, keywords):
+        """Return the names containing every (lowercase) keyword, unsorted."""
+        query = "SELECT name FROM names"
+        if keywords:
+            query += " WHERE " + " AND ".join(["instr(lower(name), ?) > 0"] * len(keywords))
+        return [row[0] for row in self.db.execute(query, keywords)]
+
+    def find_similar(self, keywords, threshold, limit):
+        """
+        Fuzzy match keywords against names by trigram similarity.
+
+        Each keyword scores a name by the fraction of its trigrams found in
+        the name; a name's similarity is its lowest keyword score (keywords
+        too short for trigrams, or without any letters, must appear exactly).
+
+        Return at most limit (name, similarity) pairs with similarity of at
+        least threshold, most similar first.
+        """
+        import collections
+        import heapq
+        scores = None
+        exact = [word for word in keywords
+                if len(word) < NameIndex.N or not any(c.isalpha() for c in word)]
+        for word in keywords:
+            if word in exact:
+                continue
+            grams = NameIndex.trigrams(word)
+            counts = collections.Counter()
+            for ids in self.postings(grams).values():
+                counts.update(ids)
+            word_scores = {i: count / len(grams) for i, count in counts.items()
+                    if count / len(grams) >= threshold}
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {i: min(score, word_scores[i]) for i, score in scores.items()
+                        if i in word_scores}
+        if not scores:
+            return []
+
+        names = dict(self.db.execute("SELECT id, name FROM names WHERE id IN ({})".format(
+            ", ".join(str(i) for i in scores))))
+        matches = ((score, names[i]) for i, score in scores.items()
+                if all(word in names[i].lower() for word in exact))
+        return [(name, score) for score, name in heapq.nlargest(limit, matches)]
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+#
+# Search queries, and scanning entry text for them.
+#
+
+import re
+
+from journalctl import JournalCtl, Entry
+
+class Query:
+    """
+    A search query, checked against an entry's text once it's lowercased.
+
+    Each argument is one term, unless it contains balanced double quotes, in
+    which case it's split into its quoted phrases & other words (so
+    '"a phrase" other' is two terms). Terms are:
+
+        word, "a phrase"    text contains it (case-insensitive)
+        -term               the term must *not* match
+        a OR b              either term matches
+        title:x, tags:x,    the front matter field contains x
+        categories:x
+        date:2014-03        the entry's date starts with 2014-03
+
+    All terms (or OR groups) must match. Negated terms can be given after
+    the command like any other argument (e.g. 'jctl search tiger -ocean').
+
+    Each text term is a plain substring search, which the bytes & str types
+    do with a fast literal search (unlike a case-insensitive regex), made
+    only when its group is reached: checking stops at the first group that
+    fails, so a query costs at most one search per term.
+    """
+    OR = "OR"
+    NOT = "-"
+    FIELD_SEP = ":"
+    FIELDS = ["title", "tags", "categories"]
+    DATE_FIELD = "date"
+    # a double-quoted phrase (with anything before it, e.g. '-' or 'title:')
+    # or a word
+    PHRASE_RE = re.compile(r'(\S*?)"([^"]*)"|(\S+)')
+
+    def __init__(self, arguments):
+        words = []
+        for arg in arguments:
+            quotes = arg.count("\"")
+            if quotes == 0 or quotes % 2 != 0:
+                # no phrases (apostrophes and stray quotes are literal)
+                words.append(arg)
+                continue
+            for prefix, phrase, word in Query.PHRASE_RE.findall(arg):
+                words.append(word or prefix + phrase)
+
+        # groups of terms that are OR'd together, all of which are AND'd
+        # each term is a tuple (negated, field, value)
+        self.groups = []
+        join_next = False
+        for i, word in enumerate(words):
+            if word == Query.OR and self.groups and not join_next \
+                    and i < len(words) - 1:
+                join_next = True
+                continue
+            term = Query.parse_term(word)
+            if join_next:
+                self.groups[-1].append(term)
+            else:
+                self.groups.append([term])
+            join_next = False
+
+        self.patterns = frozenset(value for group in self.groups
+                for negated, field, value in group
+                if field != Query.DATE_FIELD)
+        self.ascii = all(pattern.isascii() for pattern in self.patterns)
+        # what to search the lowercased text for: bytes for ASCII queries
+        if self.ascii:
+            self.keys = {p: p.encode("ascii") for p in self.patterns}
+        else:
+            self.keys = {p: p for p in self.patterns}
+
+    @staticmethod
+    def parse_term(word):
+        negated = False
+        if word.startswith(Query.NOT) and len(word) > 1 \
+                and not word[1:].startswith(Query.NOT):
+            negated = True
+            word = word[1:]
+        field = None
+        name, sep, value = word.partition(Query.FIELD_SEP)
+        if sep and value and name in Query.FIELDS + [Query.DATE_FIELD]:
+            field, word = name, value
+        return (negated, field, word.lower())
+
+    def is_simple(self):
+        """Return whether this is a plain AND of text keywords."""
+        return all(len(group) == 1 and not group[0][0] and group[0][1] is None
+                for group in self.groups)
+
+    def required_keywords(self):
+        """Return text keywords every match must contain."""
+        return [group[0][2] for group in self.groups
+                if len(group) == 1 and not group[0][0] and group[0][1] is None]
+
+    def positive_keywords(self):
+        """Return all text/field values that aren't negated (for ranking)."""
+        return [value for group in self.groups for negated, field, value in group
+                if not negated and field != Query.DATE_FIELD]
+
+    def match_name(self, entry):
+        """
+        Check the parts of the query that only need an entry's name (groups
+        made up of date terms). Return False if the entry can't match.
+        """
+        date = entry[:10]
+        for group in self.groups:
+            if all(field == Query.DATE_FIELD for negated, field, value in group):
+                if not any(date.startswith(value) != negated
+                        for negated, field, value in group):
+                    return False
+        return True
+
+    def evaluate(self, entry, data):
+        """
+        Evaluate the query for an entry given its lowercased text (as
+        lower() returns it), group by group, stopping at the first group
+        that fails.
+        """
+        date = entry[:10]
+        header = None
+        for group in self.groups:
+            for negated, field, value in group:
+                if field is None:
+                    result = self.keys[value] in data
+                elif field == Query.DATE_FIELD:
+                    result = date.startswith(value)
+                else:
+                    if header is None:
+                        end = JournalCtl.FRONT_MATTER_END
+                        if self.ascii:
+                            end = end.encode(Entry.ENCODING)
+                        header = data[:max(data.find(end), 0)]
+                    result = Query.field_contains(header, field, value)
+                if result != negated:
+                    break
+            else:
+                return False
+        return True
+
+    @staticmethod
+    def field_contains(header, field, value):
+        prefix = field + JournalCtl.FRONT_MATTER_VALUE_SEP
+        newline = "\n"
+        if isinstance(header, bytes):
+            prefix = prefix.encode(Entry.ENCODING)
+            value = value.encode(Entry.ENCODING)
+            newline = newline.encode(Entry.ENCODING)
+        for line in header.split(newline):
+            if line.startswith(prefix) and value in line[len(prefix):]:
+                return True
+        return False
+
+    def lower(self, data):
+        """
+        Return an entry's contents (bytes) lowercased: as raw bytes for ASCII
+        queries, otherwise after decoding.
+        """
+        if self.ascii:
+            return data.lower()
+        return data.decode(Entry.ENCODING, errors="replace").lower()
+
+    def match_data(self, entry, data):
+        """
+        Return whether an entry's contents (bytes) match the query. The
+        contents are lowercased once.
+        """
+        return self.evaluate(entry, self.lower(data))
+
+    def count_tokens(self, tokens):
+        """
+        Return lowercase ranking tokens in the form match_counts() takes
+        (bytes, for an ASCII query).
+        """
+        if self.ascii:
+            return [token.encode(Entry.ENCODING) for token in tokens]
+        return list(tokens)
+
+    def match_counts(self, entry, data, tokens):
+        """
+        Check an entry's contents (bytes) against the query, counting ranking
+        tokens (from count_tokens()) in the same lowercased text. Return
+        (matched, tfs), where tfs is how many times each token occurs if the
+        entry matches, or else just whether it does (1 or 0), which is all
+        its document frequencies need.
+        """
+        data = self.lower(data)
+        if self.evaluate(entry, data):
+            return True, [data.count(token) for token in tokens]
+        return False, [int(token in data) for token in tokens]
+
+def scan_files(files, query, tokens=None):
+    """
+    Return (matches, nbytes): the entries matching a Query, in the order
+    given, and the number of bytes read. files is a list of (entry, filename)
+    pairs; each file whose name can match is read once.
+
+    Given ranking tokens (see Query.match_counts()), return a record for
+    each entry read instead of matches: (entry, matched, length, tfs), with
+    its length in bytes.
+    """
+    if tokens is not None:
+        tokens = query.count_tokens(tokens)
+    results = []
+    nbytes = 0
+    for entry, filename in files:
+        if not query.match_name(entry):
+            continue
+        with open(filename, "rb") as f:
+            data = f.read()
+        nbytes += len(data)
+        if tokens is not None:
+            matched, tfs = query.match_counts(entry, data, tokens)
+            results.append((entry, matched, len(data), tfs))
+        elif query.match_data(entry, data):
+            results.append(entry)
+    return results, nbytes
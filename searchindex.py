@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+#
+# Full text search index over journal entries (jctl search --index).
+#
+
+import math
+import re
+
+class SearchIndex:
+    """
+    Persistent inverted index over entry text, used by search_entries(),
+    kept in an SQLite database in the journal's cache directory.
+
+    Each indexed entry is stored along with the mtime & size it had when it
+    was tokenised, so an update only re-reads entries that changed since the
+    last run. Terms are the lowercased word runs of an entry's full text, and
+    are only stored once, in the postings (with their counts, for ranking
+    matches with BM25). Lookups are queries against the database, so nothing
+    has to be loaded up front.
+
+    Entry ids are never reused: a changed or removed entry's postings are
+    left behind until there are enough stale ones to be worth purging.
+    """
+    VERSION = 3
+    TOKEN_RE = re.compile(r"\w+")
+
+    # BM25 parameters
+    K1 = 1.2
+    B = 0.75
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            mtime INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            length INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS terms (
+            id INTEGER PRIMARY KEY,
+            term TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            term INTEGER NOT NULL,
+            file INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (term, file)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS stale (
+            count INTEGER NOT NULL
+        );
+    """
+
+    # the ids of the files containing a term with a token in it
+    TOKEN_FILES = """
+        SELECT file FROM postings WHERE term IN
+            (SELECT id FROM terms WHERE instr(term, ?) > 0)
+    """
+
+    def __init__(self, path):
+        import sqlite3
+        self.db = sqlite3.connect(path)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SearchIndex.VERSION:
+            self.db.executescript("""
+                DROP TABLE IF EXISTS postings;
+                DROP TABLE IF EXISTS terms;
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS stale;
+            """)
+            self.db.executescript(SearchIndex.SCHEMA)
+            self.db.execute("INSERT INTO stale VALUES (0)")
+            self.db.execute("PRAGMA user_version = {}".format(SearchIndex.VERSION))
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def tokenise(text):
+        """Return a dict of the terms in some text to their counts."""
+        import collections
+        return dict(collections.Counter(SearchIndex.TOKEN_RE.findall(text.lower())))
+
+    def __add(self, entry, stat, text):
+        terms = self.tokenise(text)
+        cursor = self.db.execute("INSERT INTO files (name, mtime, size, length) "
+                "VALUES (?, ?, ?, ?)", (entry, stat[0], stat[1], sum(terms.values())))
+        file_id = cursor.lastrowid
+        self.db.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)",
+                ((term,) for term in terms))
+        self.db.executemany("INSERT INTO postings SELECT id, ?, ? FROM terms WHERE term = ?",
+                ((file_id, count, term) for term, count in terms.items()))
+
+    def __remove(self, entry):
+        if self.db.execute("DELETE FROM files WHERE name = ?", (entry,)).rowcount:
+            self.db.execute("UPDATE stale SET count = count + 1")
+
+    def update(self, stats, get_text):
+        """
+        Bring the index in line with the given {entry: (mtime, size)} dict,
+        re-tokenising only new or changed entries (read using get_text).
+
+        Return the number of entries (re-)indexed.
+        """
+        known = {name: (mtime, size) for name, mtime, size
+                in self.db.execute("SELECT name, mtime, size FROM files")}
+        changes = {name: None for name in known if name not in stats}
+        changes.update((entry, stat) for entry, stat in stats.items()
+                if known.get(entry) != stat)
+        self.apply_changes(changes, get_text)
+        return len(changes) - sum(1 for stat in changes.values() if stat is None)
+
+    def apply_changes(self, changes, get_text):
+        """
+        Update the index for only the given {entry: (mtime, size)} changes,
+        where a stat of None means the entry was removed.
+        """
+        if not changes:
+            return
+        with self.db:
+            for entry, stat in changes.items():
+                self.__remove(entry)
+                if stat is not None:
+                    self.__add(entry, stat, get_text(entry))
+            self.__purge()
+
+    def __purge(self):
+        """Delete stale postings & unused terms, if there are enough of them."""
+        stale = self.db.execute("SELECT count FROM stale").fetchone()[0]
+        live = self.db.execute("SELECT count(*) FROM files").fetchone()[0]
+        if stale <= live + 1024:
+            return
+        self.db.execute("DELETE FROM postings WHERE file NOT IN (SELECT id FROM files)")
+        self.db.execute("DELETE FROM terms WHERE id NOT IN (SELECT term FROM postings)")
+        self.db.execute("UPDATE stale SET count = 0")
+
+    def __files(self, tokens):
+        """Return the names of the entries containing every token."""
+        query = " INTERSECT ".join([SearchIndex.TOKEN_FILES] * len(tokens))
+        return {row[0] for row in self.db.execute(
+            "SELECT name FROM files WHERE id IN ({})".format(query), tokens)}
+
+    def query(self, keywords):
+        """
+        Narrow down the entries that could contain *every* keyword
+        (case-insensitive substring match, like a full text scan).
+
+        Return a tuple (matches, unverified): entries in matches definitely
+        match, entries in unverified may match and need their text checked.
+        """
+        tokens = []
+        verified = True
+        for keyword in keywords:
+            word = keyword.lower()
+            tokens += SearchIndex.TOKEN_RE.findall(word)
+            if SearchIndex.TOKEN_RE.fullmatch(word) is None:
+                # multi-word/punctuated keyword: tokens being present doesn't
+                # mean they're present in the same order (or at all, for only
+                # punctuation)
+                verified = False
+
+        if tokens:
+            found = self.__files(tokens)
+        else:
+            found = {row[0] for row in self.db.execute("SELECT name FROM files")}
+        return (found, set()) if verified else (set(), found)
+
+    def rank(self, entries, keywords, limit):
+        """
+        Score entries against the keywords using BM25 and return the best
+        (at most limit) as a list of (entry, score) pairs, best first.
+
+        Each keyword token counts as one query term, made up of all the
+        indexed terms containing it.
+        """
+        import heapq
+        num_files, total_length = self.db.execute(
+                "SELECT count(*), sum(length) FROM files").fetchone()
+        if num_files == 0:
+            return []
+        avg_length = total_length / num_files
+
+        scores = dict.fromkeys(entries, 0.0)
+        for keyword in keywords:
+            for token in SearchIndex.TOKEN_RE.findall(keyword.lower()):
+                rows = self.db.execute("""
+                    SELECT name, length, sum(count) FROM postings
+                        JOIN files ON files.id = postings.file
+                    WHERE term IN (SELECT id FROM terms WHERE instr(term, ?) > 0)
+                    GROUP BY file
+                """, (token,)).fetchall()
+                df = len(rows)
+                for entry, length, tf in rows:
+                    if entry in scores:
+                        scores[entry] += SearchIndex.score(tf, df, num_files,
+                                length, avg_length)
+
+        best = heapq.nlargest(limit, ((score, entry) for entry, score in scores.items()))
+        return [(entry, score) for score, entry in best]
+
+    @staticmethod
+    def score(tf, df, num_files, length, avg_length):
+        """
+        Return the BM25 score of a query term for an entry of length terms,
+        where it occurs tf times, given that df of num_files entries contain
+        it.
+        """
+        idf = math.log((num_files - df + 0.5) / (df + 0.5) + 1)
+        return idf * tf * (SearchIndex.K1 + 1) / (tf + SearchIndex.K1
+                * (1 - SearchIndex.B + SearchIndex.B * length / avg_length))
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from journalctl import check_files, entry_date
+
+ENTRY = """---
+layout: post
+title: {}
+date: {}
+---
+Body text.
+"""
+
+class TestEntryDate(unittest.TestCase):
+    def test_dates(self):
+        self.assertEqual(entry_date("2014-03-05 10:00:00 +0000"), "2014-03-05")
+        self.assertEqual(entry_date("2014-03-05T10:00:00+00:00"), "2014-03-05")
+        self.assertEqual(entry_date("\"2014-03-06\""), "2014-03-06")
+        self.assertEqual(entry_date("'2014-03-06 10:00'"), "2014-03-06")
+
+    def test_not_dates(self):
+        self.assertIsNone(entry_date("yesterday"))
+        self.assertIsNone(entry_date("14-03-05"))
+        self.assertIsNone(entry_date("2014-03-055"))
+
+class TestCheckFiles(unittest.TestCase):
+    def check(self, title, date):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "entry.md")
+            with open(filename, "w") as f:
+                f.write(ENTRY.format(title, date))
+            results, nbytes = check_files([("entry", filename)], 4096)
+        self.assertGreater(nbytes, 0)
+        return results[0]
+
+    def test_iso_date(self):
+        self.assertEqual(self.check("ISO Date", "2014-03-05T10:00:00+00:00"),
+                ("entry", "2014-03-05", "ISO Date", None))
+
+    def test_quoted_date(self):
+        self.assertEqual(self.check("\"Quoted Date\"", "\"2014-03-06\""),
+                ("entry", "2014-03-06", "Quoted Date", None))
+
+    def test_bad_date(self):
+        entry, date, title, problem = self.check("Bad Date", "March 5th")
+        self.assertIsNone(date)
+        self.assertIsNone(title)
+        self.assertIn("YYYY-MM-DD", problem)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from journalctl import JournalCtl
+
+class TestParseCommandArgs(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        os.mkdir(os.path.join(tmp.name, "_posts"))
+        self.base = tmp.name
+
+    def parse(self, *args):
+        argv = ["jctl", "--base", self.base] + list(args)
+        with mock.patch.object(sys, "argv", argv), \
+                mock.patch.dict(os.environ, {"EDITOR": "true"}):
+            return JournalCtl()
+
+    def test_options_before_command(self):
+        jctl = self.parse("-rv", "-k5", "search", "apple")
+        self.assertTrue(jctl.args.rank)
+        self.assertTrue(jctl.args.verbose)
+        self.assertEqual(jctl.args.limit, 5)
+        self.assertEqual(jctl.arguments, ["apple"])
+
+    def test_exact_options_after_command(self):
+        jctl = self.parse("search", "--rank", "apple", "--limit", "3", "--since=2014")
+        self.assertTrue(jctl.args.rank)
+        self.assertEqual(jctl.args.limit, 3)
+        self.assertEqual(jctl.since, "2014")
+        self.assertEqual(jctl.arguments, ["apple"])
+
+        jctl = self.parse("commit", "-m", "A title", "tiger")
+        self.assertEqual(jctl.commit_msg, "A title")
+        self.assertEqual(jctl.arguments, ["tiger"])
+
+    def test_negations_like_short_option_groups(self):
+        for negation in ["-red", "-dev", "-ave", "-rv"]:
+            jctl = self.parse("search", "apple", negation)
+            self.assertEqual(jctl.arguments, ["apple", negation])
+            self.assertFalse(jctl.args.rank)
+            self.assertFalse(jctl.args.daemon)
+            self.assertFalse(jctl.args.edit)
+            self.assertFalse(jctl.args.verbose)
+            self.assertFalse(jctl.args.all)
+
+    def test_abbreviations_after_command(self):
+        jctl = self.parse("search", "apple", "--ran")
+        self.assertEqual(jctl.arguments, ["apple", "--ran"])
+        self.assertFalse(jctl.args.rank)
+
+    def test_arguments_after_double_dash(self):
+        jctl = self.parse("search", "--", "apple", "--rank", "-r")
+        self.assertEqual(jctl.arguments, ["apple", "--rank", "-r"])
+        self.assertFalse(jctl.args.rank)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+#
+# Per-phase timings of a jctl run (jctl --timings).
+#
+
+import sys
+import time
+
+class Timings:
+    """
+    Count, wall time and bytes read for each phase of a jctl run (--timings).
+
+    Phases are named after the choke point recording them (e.g. 'shell git',
+    'read entry', 'command search') and can nest, so a command's time
+    includes the shell commands and file reads done while running it.
+    """
+    def __init__(self, as_json=False):
+        self.as_json = as_json
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    def add(self, phase, seconds, nbytes=0, count=1):
+        stats = self.phases.setdefault(phase, [0, 0.0, 0])
+        stats[0] += count
+        stats[1] += seconds
+        stats[2] += nbytes
+
+    class Phase:
+        """Context manager recording a block as one count of a phase."""
+        __slots__ = ("timings", "phase", "nbytes", "start")
+
+        def __init__(self, timings, phase):
+            self.timings = timings
+            self.phase = phase
+            self.nbytes = 0
+
+        def __enter__(self):
+            self.start = time.perf_counter()
+            return self
+
+        def __exit__(self, *exc_info):
+            self.timings.add(self.phase, time.perf_counter() - self.start,
+                    self.nbytes)
+
+    class File:
+        """Text file proxy recording time spent in, and bytes read by, read()."""
+        def __init__(self, timings, phase, f):
+            self.timings = timings
+            self.phase = phase
+            self.f = f
+
+        def read(self, size=-1):
+            start = time.perf_counter()
+            pos = self.f.buffer.tell()
+            data = self.f.read(size)
+            self.timings.add(self.phase, time.perf_counter() - start,
+                    self.f.buffer.tell() - pos, count=0)
+            return data
+
+        def __getattr__(self, name):
+            return getattr(self.f, name)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            self.f.close()
+
+    def report(self, pipe=sys.stderr):
+        """Print the phases (slowest first) as a table, or as JSON."""
+        wall = time.perf_counter() - self.started
+        phases = sorted(self.phases.items(), key=lambda item: -item[1][1])
+        if self.as_json:
+            import json
+            json.dump({"wall": wall, "phases": [
+                    {"phase": phase, "count": count, "seconds": seconds, "bytes": nbytes}
+                    for phase, (count, seconds, nbytes) in phases]}, pipe)
+            print(file=pipe)
+            return
+        print("{:<28} {:>6} {:>10} {:>12}".format("phase", "count", "seconds", "bytes"),
+                file=pipe)
+        for phase, (count, seconds, nbytes) in phases:
+            print("{:<28} {:>6} {:>10.4f} {:>12}".format(phase, count, seconds, nbytes),
+                    file=pipe)
+        print("{:<28} {:>6} {:>10.4f}".format("total (wall)", "", wall), file=pipe)
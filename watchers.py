@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+#
+# Watching the entry directory for changes (for the jctl daemon).
+#
+
+import os
+
+from journalctl import iter_tree
+
+class InotifyWatcher:
+    """
+    Watch an entry directory (and its subdirectories) for changes using Linux
+    inotify (via ctypes).
+
+    Events are queued as they're read, and changes() drains the queue into
+    the set of entry names that changed, so a long-running process can
+    update its derived data at O(changes) cost.
+    """
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+
+    WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM \
+            | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    # events after which we can't trust what we know about the directory
+    RESCAN_MASK = IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF
+
+    EVENT_FORMAT = "iIII"
+
+    def __init__(self, path):
+        """Start watching, raising OSError if inotify isn't available."""
+        import collections
+        import ctypes
+        import ctypes.util
+        import struct
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            init, self.add_watch = libc.inotify_init1, libc.inotify_add_watch
+        except (OSError, AttributeError, TypeError):
+            raise OSError("inotify not available")
+        self.get_errno = ctypes.get_errno
+        self.fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        try:
+            self.watch_tree(path)
+        except OSError:
+            os.close(self.fd)
+            raise
+        self.queue = collections.deque()
+        self.event = struct.Struct(InotifyWatcher.EVENT_FORMAT)
+
+    def watch_tree(self, path):
+        """Watch a directory and all its (non-hidden) subdirectories."""
+        wd = self.add_watch(self.fd, os.fsencode(path), InotifyWatcher.WATCH_MASK)
+        if wd < 0:
+            raise OSError(self.get_errno(), "inotify_add_watch failed", path)
+        self.dirs[wd] = path
+        with os.scandir(path) as it:
+            for dirent in it:
+                if dirent.is_dir() and not dirent.name.startswith("."):
+                    self.watch_tree(dirent.path)
+
+    def close(self):
+        os.close(self.fd)
+
+    def read_events(self):
+        """Read all pending events into the queue as (wd, mask, filename)."""
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(buf):
+                wd, mask, cookie, length = self.event.unpack_from(buf, offset)
+                offset += self.event.size
+                name = os.fsdecode(buf[offset:offset+length].rstrip(b"\0"))
+                offset += length
+                self.queue.append((wd, mask, name))
+
+    def changes(self):
+        """
+        Drain the event queue. Return a tuple (names, rescan): the set of
+        entry names that changed, and whether a full rescan is needed instead.
+        """
+        self.read_events()
+        names = set()
+        rescan = False
+        while self.queue:
+            wd, mask, name = self.queue.popleft()
+            if mask & InotifyWatcher.RESCAN_MASK:
+                rescan = True
+            elif not name or name.startswith("."):
+                continue
+            elif mask & InotifyWatcher.IN_ISDIR:
+                # a subdirectory came or went: entries may have moved with it
+                rescan = True
+                path = os.path.join(self.dirs.get(wd, ""), name)
+                if mask & (InotifyWatcher.IN_CREATE | InotifyWatcher.IN_MOVED_TO) \
+                        and os.path.isdir(path):
+                    try:
+                        self.watch_tree(path)
+                    except OSError:
+                        pass
+            else:
+                names.add(os.path.splitext(name)[0])
+        return names, rescan
+
+class PollingWatcher:
+    """
+    Fallback for InotifyWatcher: finds changes by comparing the entry
+    directory against the last snapshot of it (O(entries) per check).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = self.scan()
+
+    def close(self):
+        pass
+
+    def scan(self):
+        snapshot = {}
+        for dirent in iter_tree(self.path):
+            st = dirent.stat()
+            snapshot[dirent.name] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def changes(self):
+        snapshot = self.scan()
+        changed = {name for name in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(name) != self.snapshot.get(name)}
+        self.snapshot = snapshot
+        return {os.path.splitext(name)[0] for name in changed}, False
+
+def watch_entries(path):
+    """Return an inotify watcher for a directory, or a polling one."""
+    try:
+        return InotifyWatcher(path)
+    except OSError:
+        return PollingWatcher(path)